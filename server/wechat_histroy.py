@@ -1,26 +1,44 @@
+import gzip
 import requests
-import json
+import orjson
 import os
+import re
 from datetime import datetime
-from typing import Optional, Dict, Any
+from typing import Optional, Any, List
 import logging
 
 # 配置日志
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# 文件名中不允许出现的字符：除字母、数字（含中文等Unicode字符）和"._-"以外的字符
+_UNSAFE_FILENAME_CHARS = re.compile(r'[^\w.-]')
+
 class WeChatHistoryExporter:
     """微信聊天记录导出器"""
     
     def __init__(self, api_base: str = "http://localhost:5030/api/v1/chatlog"):
         self.api_base = api_base
+        # 复用同一个会话，分页请求时保持长连接
+        self.session = requests.Session()
+        self.session.headers.update({"Accept-Encoding": "gzip"})
+    
+    def close(self):
+        """关闭HTTP会话"""
+        self.session.close()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
         
     def fetch_chat_history(self, 
                           talker: str,
                           start_date: str = "2022-01-01",
                           end_date: Optional[str] = None,
                           limit: int = 1000000,
-                          offset: int = 0) -> Optional[Dict[Any, Any]]:
+                          offset: int = 0) -> Optional[Any]:
         """
         获取聊天记录
         
@@ -47,83 +65,122 @@ class WeChatHistoryExporter:
         
         try:
             logger.info(f"正在获取 {talker} 的聊天记录...")
-            response = requests.get(self.api_base, params=params, timeout=30)
+            response = self.session.get(self.api_base, params=params, timeout=30)
             response.raise_for_status()  # 抛出HTTP错误异常
             
-            return response.json()
+            # 直接解析响应字节，省去先解码为str的一次完整遍历
+            return orjson.loads(response.content)
             
         except requests.exceptions.RequestException as e:
             logger.error(f"请求失败: {e}")
             return None
-        except json.JSONDecodeError as e:
+        except orjson.JSONDecodeError as e:
             logger.error(f"JSON解析失败: {e}")
             return None
     
-    def save_to_file(self, data: Dict[Any, Any], filename: str, output_dir: str = "data") -> bool:
+    def export_chat_history(self, 
+                           talker: str,
+                           start_date: str = "2022-01-01",
+                           end_date: Optional[str] = None,
+                           output_dir: str = "output",
+                           page_size: int = 10000) -> bool:
         """
-        保存数据到文件
+        导出聊天记录的完整流程
+        
+        按页请求聊天记录，并以NDJSON格式（每行一条记录）逐页写入文件，
+        内存占用只与单页大小有关，而不是整个聊天记录。
         
         Args:
-            data: 要保存的数据
-            filename: 文件名
+            talker: 聊天对象
+            start_date: 开始日期
+            end_date: 结束日期
             output_dir: 输出目录
+            page_size: 每页请求的记录数量
             
         Returns:
-            保存是否成功
+            导出是否成功
         """
+        # 生成文件名
+        if end_date is None:
+            end_date = datetime.now().strftime("%Y-%m-%d")
+            
+        safe_talker = _UNSAFE_FILENAME_CHARS.sub("", talker)
+        filename = f"chatlog_{safe_talker}_{start_date.replace('-', '')}_{end_date.replace('-', '')}.jsonl.gz"
+        
+        # 先写入临时文件，全部页面写完后再替换为正式文件名，
+        # 中途失败时不会留下看起来完整、实际被截断的文件
+        filepath = os.path.join(output_dir, filename)
+        tmp_path = f"{filepath}.{os.getpid()}.tmp"
+        completed = False
         try:
             # 确保输出目录存在
             os.makedirs(output_dir, exist_ok=True)
             
-            filepath = os.path.join(output_dir, filename)
-            
-            with open(filepath, "w", encoding="utf-8") as f:
-                json.dump(data, f, ensure_ascii=False, indent=2)
+            offset = 0
+            previous_records = None
+            # 使用gzip压缩保存，减少写入磁盘的数据量；压缩级别3兼顾速度和压缩率
+            with gzip.open(tmp_path, "wb", compresslevel=3) as f:
+                while True:
+                    # 获取一页聊天记录
+                    page = self.fetch_chat_history(talker, start_date, end_date,
+                                                   limit=page_size, offset=offset)
+                    if page is None:
+                        return False
+                    
+                    records = self._get_page_records(page)
+                    if records is None:
+                        logger.error(f"❌ 无法识别的响应格式: {type(page).__name__}")
+                        return False
+                    if not records:
+                        break
+                    # 服务端忽略offset时每次都会返回同一页，没有新数据就停止
+                    if records == previous_records:
+                        logger.warning("接口返回了与上一页相同的数据，可能不支持offset分页，停止请求")
+                        break
+                    
+                    # 逐条写入，每条记录占一行
+                    for record in records:
+                        f.write(orjson.dumps(record, option=orjson.OPT_APPEND_NEWLINE | orjson.OPT_NON_STR_KEYS))
+                    
+                    offset += len(records)
+                    if len(records) < page_size:
+                        break
+                    previous_records = records
             
-            logger.info(f"✅ 聊天记录已保存至 {filepath}")
+            os.replace(tmp_path, filepath)
+            completed = True
+            logger.info(f"✅ 共 {offset} 条聊天记录已保存至 {filepath}")
             return True
             
         except Exception as e:
             logger.error(f"❌ 保存文件失败: {e}")
             return False
+        finally:
+            if not completed:
+                try:
+                    os.remove(tmp_path)
+                except OSError:
+                    pass
     
-    def export_chat_history(self, 
-                           talker: str,
-                           start_date: str = "2022-01-01",
-                           end_date: Optional[str] = None,
-                           output_dir: str = "output") -> bool:
+    @staticmethod
+    def _get_page_records(page: Any) -> Optional[List[Any]]:
         """
-        导出聊天记录的完整流程
+        从一页响应数据中取出记录列表
         
         Args:
-            talker: 聊天对象
-            start_date: 开始日期
-            end_date: 结束日期
-            output_dir: 输出目录
+            page: 接口返回的数据，可能是记录列表或包含items字段的字典
             
         Returns:
-            导出是否成功
+            该页的记录列表，响应格式无法识别时返回None
         """
-        # 获取聊天记录
-        chat_data = self.fetch_chat_history(talker, start_date, end_date)
-        
-        if chat_data is None:
-            return False
-        
-        # 生成文件名
-        if end_date is None:
-            end_date = datetime.now().strftime("%Y-%m-%d")
-            
-        safe_talker = "".join(c for c in talker if c.isalnum() or c in "._-")
-        filename = f"chatlog_{safe_talker}_{start_date.replace('-', '')}_{end_date.replace('-', '')}.json"
-        
-        # 保存文件
-        return self.save_to_file(chat_data, filename, output_dir)
+        if isinstance(page, list):
+            return page
+        if isinstance(page, dict) and isinstance(page.get("items"), list):
+            return page["items"]
+        return None
 
 def main():
     """主函数"""
-    exporter = WeChatHistoryExporter()
-    
     # 配置参数
     talker = "陈泽文"
     start_date = "2024-01-01"
@@ -131,12 +188,13 @@ def main():
     # start_date = "2022-01-01"
     # end_date = "2025-08-01"
     
-    # 导出聊天记录
-    success = exporter.export_chat_history(
-        talker=talker,
-        start_date=start_date,
-        end_date=end_date
-    )
+    # 导出聊天记录；导出多个聊天对象时可以在同一个with块内复用会话
+    with WeChatHistoryExporter() as exporter:
+        success = exporter.export_chat_history(
+            talker=talker,
+            start_date=start_date,
+            end_date=end_date
+        )
     
     if not success:
         logger.error("导出失败")
@@ -3,43 +3,29 @@
 
 import ast
 import re
+from collections import OrderedDict
 from ollama import Client
-from typing import List
-from PyQt6.QtCore import QObject, pyqtSignal, QRunnable, QThreadPool
+from typing import Iterator, List, Optional, Tuple
+from PyQt6.QtCore import QObject, pyqtSignal, pyqtSlot, QThread, QTimer, QCoreApplication
 import datetime
+import orjson
 
 
-class AICompletionWorker(QRunnable):
-    """在后台线程中运行AI补全的Worker。"""
-    
-    def __init__(self, text: str):
-        super().__init__()
-        self.text = text
-        self.signals = self.WorkerSignals()
-
-    class WorkerSignals(QObject):
-        """定义此Worker可发出的信号。"""
-        finished = pyqtSignal(list)
-        error = pyqtSignal(str)
+# 预编译解析AI返回内容所用的正则表达式
+_BRACKET_RE = re.compile(r'\[(.*?)\]', re.DOTALL)
+_QUOTED_RE = re.compile(r'["\']([^"\']+)["\']')
 
-    def run(self):
-        """执行AI补全任务。"""
-        print("用户输入:", self.text)
-        
-        try:
-            client = Client()
-            datetime_str = datetime.datetime.now().strftime("%Y-%m-%d %H:%M")
-            # prompt = ("""我的原本输入是：‘{user_input}’，请你继续以我的口吻继续补全这段和别人的对话，要求尽可能贴近真实用户的输入。
-            #             要求和原本输入内容强相关，语气通顺自然，符合对话情景。不要提供任何解释或多余的文字，只返回补全的内容。
-            #             要求返1个string list，list中包含三个字符串，格式为：['response1', 'response2', 'response3'].
-            #             注意：
-            #             1. 只要3条内容，不能多也不能少；
-            #             2. 3条内容要各不相同，尽可能差异化；
-            #             3. 每条回复必须50字以内；
-            #             4. 用户很有可能会输入错别字和模糊拼音，根据你常识纠正补全的内容。
-            #             5. 当前的时间是：{datetime}。""".format(user_input=self.text, datetime=datetime_str)
-            #         )
-            prompt = ("""我的原本输入是：'{user_input}'，请帮我润色这段要发给女朋友的微信内容。
+# 补全请求的提示词模板
+# _PROMPT_TEMPLATE = """我的原本输入是：‘{user_input}’，请你继续以我的口吻继续补全这段和别人的对话，要求尽可能贴近真实用户的输入。
+#             要求和原本输入内容强相关，语气通顺自然，符合对话情景。不要提供任何解释或多余的文字，只返回补全的内容。
+#             要求返1个string list，list中包含三个字符串，格式为：['response1', 'response2', 'response3'].
+#             注意：
+#             1. 只要3条内容，不能多也不能少；
+#             2. 3条内容要各不相同，尽可能差异化；
+#             3. 每条回复必须50字以内；
+#             4. 用户很有可能会输入错别字和模糊拼音，根据你常识纠正补全的内容。
+#             5. 当前的时间是：{datetime}。"""
+_PROMPT_TEMPLATE = """我的原本输入是：'{user_input}'，请帮我润色这段要发给女朋友的微信内容。
                     要求：
                     1. 保持我的原意，但表达更贴心温暖
                     2. 语气要温柔体贴，充满关爱
@@ -48,13 +34,60 @@ class AICompletionWorker(QRunnable):
                     5. 可以幽默诙谐一些，但是别太尴尬，
                     6. 每条回复50字以内，返回3个不同版本
                     格式：['response1', 'response2', 'response3']
-                    当前时间：{datetime}""".format(user_input=self.text, datetime=datetime_str))
+                    当前时间：{datetime}"""
+
+
+class AICompletionWorker(QObject):
+    """在后台线程中运行AI补全的Worker。
+    
+    Worker只创建一次并常驻在AIEngine的专用线程中，通过信号接收请求。
+    """
+    
+    # 信号：补全完成，参数为(请求编号, 请求文本, 补全列表)
+    finished = pyqtSignal(int, str, list)
+    # 信号：请求失败，参数为(请求编号, 错误信息)
+    error = pyqtSignal(int, str)
+    # 信号：流式返回时已经生成完整的补全条目，参数为(请求编号, 补全列表)
+    partial_ready = pyqtSignal(int, list)
+    
+    def __init__(self, client: Client, model: str = "qwen2.5:1.5b-instruct-q4_K_M", llm=None):
+        super().__init__()
+        self.client = client
+        self.model = model
+        # 进程内的llama_cpp.Llama实例，为None时使用Ollama服务
+        self.llm = llm
+        # 最新请求的编号，由AIEngine更新；编号落后的请求会被尽早放弃
+        self.latest_request_id = 0
+
+    @pyqtSlot(int, str)
+    def complete(self, request_id: int, text: str):
+        """执行AI补全任务。
+        
+        Args:
+            request_id: 请求编号
+            text: 用户输入的文本
+        """
+        if request_id != self.latest_request_id:
+            return
+        print("用户输入:", text)
+        
+        try:
+            datetime_str = datetime.datetime.now().strftime("%Y-%m-%d %H:%M")
+            prompt = _PROMPT_TEMPLATE.format(user_input=text, datetime=datetime_str)
             print("AI请求内容:", prompt)
-            response = client.chat(model='qwen2.5:1.5b', messages=[
-                {'role': 'user', 'content': prompt}
-            ])
-            
-            content = response.get("message", {}).get("content", "")
+            # 使用流式返回，边生成边通知界面，避免等待完整生成
+            content = ""
+            partial_count = 0
+            for delta in self._stream_chat(prompt):
+                if request_id != self.latest_request_id:
+                    return
+                if delta:
+                    content += delta
+                    # 只在新生成了完整的条目时才通知界面，而不是每段内容都发出
+                    partial = self._parse_partial(content)
+                    if len(partial) > partial_count:
+                        partial_count = len(partial)
+                        self.partial_ready.emit(request_id, partial)
             print("AI原始返回内容:", content)
             
             # 尝试多种解析方式
@@ -63,12 +96,57 @@ class AICompletionWorker(QRunnable):
             if completions and isinstance(completions, list) and len(completions) > 0:
                 # 确保最多只返回3个结果
                 completions = completions[:3]
-                self.signals.finished.emit(completions)
-            else:
-                self.signals.error.emit("AI返回格式不正确或内容为空")
+                self.finished.emit(request_id, text, completions)
+            elif request_id == self.latest_request_id:
+                self.error.emit(request_id, "AI返回格式不正确或内容为空")
                 
         except Exception as e:
-            self.signals.error.emit(f"AI请求失败: {e}")
+            # 已被取消的请求不再报告错误
+            if request_id == self.latest_request_id:
+                self.error.emit(request_id, f"AI请求失败: {e}")
+
+    def _stream_chat(self, prompt: str) -> Iterator[str]:
+        """以流式方式请求模型，逐段返回生成的内容。
+        
+        Args:
+            prompt: 发送给模型的提示词
+            
+        Yields:
+            每次新生成的内容片段
+        """
+        messages = [{'role': 'user', 'content': prompt}]
+        
+        # 限制生成长度和上下文窗口：3条50字以内的回复用不到更多token，
+        # 较小的上下文窗口也能减少KV缓存的分配；列表的右括号出现后即停止生成
+        if self.llm is not None:
+            for chunk in self.llm.create_chat_completion(
+                messages=messages, max_tokens=160, temperature=0.7, top_p=0.9,
+                stop=[']'], stream=True
+            ):
+                yield chunk["choices"][0]["delta"].get("content", "")
+            return
+        
+        for chunk in self.client.chat(model=self.model, messages=messages,
+                                      stream=True, keep_alive='30m', options={
+                                          'num_predict': 160,
+                                          'num_ctx': 512,
+                                          'stop': [']'],
+                                          'temperature': 0.7,
+                                          'top_p': 0.9,
+                                      }):
+            yield chunk.get("message", {}).get("content", "")
+
+    @staticmethod
+    def _parse_partial(content: str) -> List[str]:
+        """从尚未生成完的内容中取出已经完整的补全条目。
+        
+        Args:
+            content: 目前为止生成的原始内容
+            
+        Returns:
+            引号已经闭合的条目，最多3个
+        """
+        return [item for item in _QUOTED_RE.findall(content) if item.strip()][:3]
 
     def _parse_completions(self, content: str) -> List[str]:
         """解析AI返回的内容。
@@ -79,72 +157,243 @@ class AICompletionWorker(QRunnable):
         Returns:
             解析后的补全列表
         """
-        # 方法1: 直接使用ast.literal_eval
+        # 生成在右括号处停止时，返回内容不包含停止符，需要补回
+        stripped = content.rstrip()
+        if '[' in stripped and not stripped.endswith(']'):
+            content = stripped + ']'
+        
+        # 方法1: 按JSON数组直接解析（格式规范时最快）
         try:
-            completions = ast.literal_eval(content)
+            completions = orjson.loads(content)
             if isinstance(completions, list):
                 return completions
-        except:
+        except orjson.JSONDecodeError:
             pass
         
-        # 方法2: 尝试提取方括号内的内容再解析
-        try:
-            # 使用正则表达式提取类似 [item1, item2, item3] 的内容
-            match = re.search(r'\[(.*?)\]', content, re.DOTALL)
-            if match:
-                list_content = f"[{match.group(1)}]"
-                completions = ast.literal_eval(list_content)
+        # 方法2: 提取方括号内的内容，按Python列表字面量解析（兼容单引号）
+        match = _BRACKET_RE.search(content)
+        if match:
+            try:
+                completions = ast.literal_eval(f"[{match.group(1)}]")
                 if isinstance(completions, list):
                     return completions
-        except:
-            pass
+            except (ValueError, SyntaxError):
+                pass
         
-        # 方法3: 尝试按行分割
-        try:
-            if isinstance(content, str):
-                # 按行分割并清理内容
-                lines = [line.strip(' \n\r\t"\'') for line in content.split('\n') if line.strip()]
-                # 过滤掉空行和无用行
-                filtered_lines = [line for line in lines if line and not line.startswith('[') and not line.endswith(']')]
-                if filtered_lines:
-                    # 取前3个非空行
-                    return filtered_lines[:3]
-        except:
-            pass
+        # 方法3: 提取引号内的内容
+        quoted_items = [item for item in _QUOTED_RE.findall(content) if item.strip()]
+        if quoted_items:
+            return quoted_items[:3]
         
-        # 方法4: 尝试提取引号内的内容
-        try:
-            # 匹配引号内的内容
-            quoted_items = re.findall(r'["\']([^"\']*)["\']', content)
-            if quoted_items:
-                # 过滤掉空内容
-                non_empty_items = [item for item in quoted_items if item.strip()]
-                if non_empty_items:
-                    return non_empty_items[:3]
-        except:
-            pass
+        # 方法4: 按行分割
+        lines = [line.strip(' \n\r\t"\'') for line in content.split('\n') if line.strip()]
+        # 过滤掉空行和无用行
+        filtered_lines = [line for line in lines if line and not line.startswith('[') and not line.endswith(']')]
+        if filtered_lines:
+            # 取前3个非空行
+            return filtered_lines[:3]
         
         return []
 
 class AIEngine(QObject):
-    """AI引擎，用于从Ollama获取补全建议。"""
+    """AI引擎，用于从Ollama获取补全建议。
+    
+    如果提供了gguf模型路径并且安装了llama-cpp-python，则在进程内加载模型推理，
+    省去与Ollama服务之间的HTTP往返。
+    """
     
     completions_ready = pyqtSignal(list)
     error_occurred = pyqtSignal(str)
+    # 信号：流式生成过程中已经完整的补全条目
+    partial_ready = pyqtSignal(list)
+    # 信号：向Worker发送补全请求，参数为(请求编号, 请求文本)
+    request = pyqtSignal(int, str)
     
-    def __init__(self, parent=None):
-        """初始化AI引擎。"""
+    def __init__(self, parent=None, model: str = "qwen2.5:1.5b-instruct-q4_K_M",
+                 model_path: Optional[str] = None):
+        """初始化AI引擎。
+        
+        Args:
+            parent: 父对象
+            model: 使用的Ollama模型名称
+            model_path: 进程内推理使用的gguf模型路径，为None时使用Ollama服务
+        """
         super().__init__(parent)
-        self.thread_pool = QThreadPool()
+        self.model = model
+        # 所有请求共用一个客户端，复用底层HTTP连接；服务地址由Client按OLLAMA_HOST环境变量确定
+        self.client = Client()
+        self.llm = self._load_local_model(model_path) if model_path else None
+        
+        # 常驻的Worker及其线程；同一模型的并发请求在服务端并不会并行执行，单线程即可
+        self.worker = AICompletionWorker(self.client, self.model, self.llm)
+        self._worker_thread = QThread(self)
+        self.worker.moveToThread(self._worker_thread)
+        self.request.connect(self.worker.complete)
+        self.worker.finished.connect(self._on_worker_finished)
+        self.worker.error.connect(self._on_worker_error)
+        self.worker.partial_ready.connect(self._on_worker_partial)
+        self._worker_thread.start()
+        
+        app = QCoreApplication.instance()
+        if app is not None:
+            app.aboutToQuit.connect(self.shutdown)
+        
+        # 防抖：短时间内的多次请求只发送最后一次
+        self._debounce = QTimer(self)
+        self._debounce.setSingleShot(True)
+        self._debounce.setInterval(200)
+        self._debounce.timeout.connect(self._start_worker)
+        self._pending_text = ""
+        self._request_id = 0
+        # 已发送给Worker、尚未返回的请求(请求编号, 请求文本)
+        self._inflight: Optional[Tuple[int, str]] = None
+        
+        # 补全结果缓存（LRU），键为请求文本
+        self._cache: "OrderedDict[str, List[str]]" = OrderedDict()
+        self._cache_size = 128
         print("AI Engine initialized.")
 
-    def get_completions(self, text: str):
+    def _load_local_model(self, model_path: str):
+        """加载进程内推理使用的gguf模型。
+        
+        Args:
+            model_path: gguf模型文件路径
+            
+        Returns:
+            llama_cpp.Llama实例，加载失败时返回None（回退到Ollama服务）
+        """
+        try:
+            from llama_cpp import Llama
+            return Llama(model_path=model_path, n_ctx=512, n_batch=256, n_gpu_layers=-1, verbose=False)
+        except ImportError:
+            print("llama-cpp-python未安装，使用Ollama服务")
+        except Exception as e:
+            print(f"加载本地模型失败，使用Ollama服务: {e}")
+        return None
+
+    def get_completions(self, text: str, immediate: bool = False):
         """异步获取AI补全建议。
         
+        请求会先经过防抖，在空闲时间窗口内只有最后一次请求会真正发送。
+        
         Args:
             text: 用户输入的文本
+            immediate: 是否跳过防抖立即发送，用于用户主动触发的请求
+        """
+        # 过短或只有空白的输入没有补全价值，不请求模型
+        if len(text.strip()) < 2:
+            return
+        
+        cached = self._lookup_cache(text)
+        if cached is not None:
+            # 命中缓存时不再请求模型，异步发出结果以保持调用方行为一致；
+            # 先取消进行中的请求，避免它的旧结果在缓存结果之后发出
+            self.abort_current()
+            request_id = self._request_id
+            QTimer.singleShot(0, lambda: self._emit_cached(request_id, cached))
+            return
+        
+        if self._inflight == (self._request_id, text):
+            # 同样的文本正在请求中，等待它的结果即可，不必取消后重新请求
+            self._debounce.stop()
+            return
+        
+        self._pending_text = text
+        if immediate:
+            self._debounce.stop()
+            self._start_worker()
+        else:
+            self._debounce.start()
+
+    def _lookup_cache(self, text: str) -> Optional[List[str]]:
+        """查询缓存的补全结果。
+        
+        先精确匹配；否则查找最近的、是当前文本前缀且只差两个字符以内的请求。
+        
+        Args:
+            text: 用户输入的文本
+            
+        Returns:
+            缓存的补全列表，未命中时返回None
         """
-        worker = AICompletionWorker(text)
-        worker.signals.finished.connect(self.completions_ready.emit)
-        worker.signals.error.connect(self.error_occurred.emit)
-        self.thread_pool.start(worker)
+        if text in self._cache:
+            self._cache.move_to_end(text)
+            return self._cache[text]
+        
+        for key in reversed(self._cache):
+            if text.startswith(key) and len(text) - len(key) <= 2:
+                return self._cache[key]
+        return None
+
+    def _emit_cached(self, request_id: int, completions: List[str]):
+        """发出缓存的补全结果，期间请求被取消时不再发出。
+        
+        Args:
+            request_id: 命中缓存时的请求编号
+            completions: 缓存的补全结果列表
+        """
+        if request_id == self._request_id:
+            self.completions_ready.emit(completions)
+
+    def _on_worker_finished(self, request_id: int, text: str, completions: List[str]):
+        """缓存Worker的补全结果，并在请求仍然有效时转发。
+        
+        Args:
+            request_id: 本次请求的编号
+            text: 本次请求的文本
+            completions: 补全结果列表
+        """
+        self._cache[text] = completions
+        self._cache.move_to_end(text)
+        if len(self._cache) > self._cache_size:
+            self._cache.popitem(last=False)
+        # 已被取消或被更新的请求取代时，结果只缓存不发出
+        if request_id == self._request_id:
+            self._inflight = None
+            self.completions_ready.emit(completions)
+
+    def _on_worker_partial(self, request_id: int, completions: List[str]):
+        """在请求仍然有效时转发流式生成中已经完整的补全条目。
+        
+        Args:
+            request_id: 本次请求的编号
+            completions: 目前已完整的补全列表
+        """
+        if request_id == self._request_id:
+            self.partial_ready.emit(completions)
+
+    def _on_worker_error(self, request_id: int, error_msg: str):
+        """在请求仍然有效时转发Worker报告的错误。
+        
+        Args:
+            request_id: 出错请求的编号
+            error_msg: 错误信息
+        """
+        # 错误经过队列到达时请求可能已被取消或取代，此时不能清掉新请求的记录
+        if request_id == self._request_id:
+            self._inflight = None
+            self.error_occurred.emit(error_msg)
+
+    def _start_worker(self):
+        """向Worker发送最新的请求，仍在进行中的旧请求会被放弃。"""
+        self._request_id += 1
+        self.worker.latest_request_id = self._request_id
+        self._inflight = (self._request_id, self._pending_text)
+        self.request.emit(self._request_id, self._pending_text)
+
+    def abort_current(self):
+        """取消等待中和进行中的补全请求。
+        
+        正在流式生成的请求会在收到下一段内容时结束，已完成但过期的结果不会再发出。
+        """
+        self._debounce.stop()
+        self._request_id += 1
+        self.worker.latest_request_id = self._request_id
+        self._inflight = None
+
+    def shutdown(self):
+        """停止Worker线程。"""
+        # 让正在进行的请求尽早结束
+        self.worker.latest_request_id = -1
+        self._worker_thread.quit()
+        self._worker_thread.wait()
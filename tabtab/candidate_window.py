@@ -11,8 +11,76 @@ from PyQt6.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QLabel,
                            QFrame, QApplication)
 from PyQt6.QtCore import Qt, QPoint, pyqtSignal, QTimer
 from PyQt6.QtGui import QFont, QPalette, QColor, QMouseEvent
-from typing import List
+from typing import Callable, List, Sequence
+import logging
+
+
+log = logging.getLogger(__name__)
+
+
+# 候选词窗口的样式表；选中状态使用[selected="true"]属性选择器
+_CANDIDATE_QSS = """
+#candidateFrame {
+    background-color: #E9B72D;
+    border: 1px solid #D4A527;
+    border-radius: 4px;
+}
+#aiSuggestionFrame {
+    background-color: #E9B72D;
+    border: 1px solid #D4A527;
+    border-radius: 4px;
+}
+QLabel {
+    color: #000000;
+    padding: 4px 8px;
+    margin: 0px 1px;
+    background-color: transparent;
+    border-radius: 2px;
+}
+QLabel:hover {
+    background-color: rgba(255, 255, 255, 0.3);
+}
+QLabel#page_info {
+    color: #444;
+    font-size: 10pt;
+}
+QLabel[selected="true"] {
+    background-color: rgba(255, 255, 255, 0.5);
+    font-weight: bold;
+}
+"""
+
+# 按键码预先取出整数值，每次按键时不再访问PyQt6的枚举属性
+_KEY_RIGHT = Qt.Key.Key_Right.value
+_KEY_LEFT = Qt.Key.Key_Left.value
+_KEY_DOWN = Qt.Key.Key_Down.value
+_KEY_UP = Qt.Key.Key_Up.value
+_KEY_SPACE = Qt.Key.Key_Space.value
+_KEY_RETURN = Qt.Key.Key_Return.value
+_KEY_ENTER = Qt.Key.Key_Enter.value
+_KEY_ESCAPE = Qt.Key.Key_Escape.value
+# 数字键1-9到候选词索引的映射
+_DIGIT_KEYS = {getattr(Qt.Key, f"Key_{i}").value: i - 1 for i in range(1, 10)}
+
+
+class _CandidateLabel(QLabel):
+    """候选标签，点击时以自身的固定索引调用回调函数。"""
+    
+    def __init__(self, index: int, on_clicked: Callable[[int], None], parent=None):
+        """初始化候选标签。
 
+        Args:
+            index (int): 标签在标签池中的索引。
+            on_clicked (Callable[[int], None]): 点击时调用的回调函数。
+            parent: 父窗口，默认为None。
+        """
+        super().__init__(parent)
+        self.index = index
+        self._on_clicked = on_clicked
+    
+    def mousePressEvent(self, event: QMouseEvent):
+        """处理鼠标按下事件，回调点击的索引。"""
+        self._on_clicked(self.index)
 
 
 class CandidateWindow(QWidget):
@@ -30,13 +98,29 @@ class CandidateWindow(QWidget):
             parent: 父窗口，默认为None。
         """
         super().__init__(parent)
-        self.candidates: List[str] = []
+        self.candidates: Sequence[str] = ()
         self.ai_suggestions: List[str] = []
         self.selected_index = 0
         self.ai_selected_index = 0
+        # 上一次高亮的标签索引，用于只更新发生变化的标签
+        self._last_selected = 0
+        self._last_ai_selected = 0
         self.drag_position = QPoint()
+        # 拖动时合并高频的鼠标移动事件，每帧最多移动一次窗口
+        self._pending_pos = QPoint()
+        self._move_timer = QTimer(self)
+        self._move_timer.setSingleShot(True)
+        self._move_timer.setInterval(8)
+        self._move_timer.timeout.connect(self._apply_move)
         self.current_page = 0
         self.total_pages = 1
+        # 缓存主屏幕的几何信息，屏幕变化时再刷新，移动窗口时不必每次查询
+        self._screen_rect = None
+        self._watched_screen = None
+        self._refresh_screen_rect()
+        app = QApplication.instance()
+        if app is not None:
+            app.primaryScreenChanged.connect(self._refresh_screen_rect)
         
         self.setup_ui()
         self.setup_style()
@@ -77,10 +161,19 @@ class CandidateWindow(QWidget):
         self.ai_suggestion_frame.hide()
         self.main_layout.addWidget(self.ai_suggestion_frame)
         
-        # 初始化标签列表
+        # 初始化标签池，标签创建后一直复用，只更新文本和可见性
         self.candidate_labels: List[QLabel] = []
         self.ai_suggestion_labels: List[QLabel] = []
         
+        # 页码标签常驻在候选词之后
+        self.page_info_label = QLabel()
+        self.page_info_label.setObjectName("page_info")
+        self.page_info_label.hide()
+        self.candidate_layout.addWidget(self.page_info_label)
+        
+        self.ensure_candidate_labels(9)
+        self.ensure_ai_suggestion_labels(3)
+        
         # 设置字体
         font = QFont("Microsoft YaHei", 12)
         self.setFont(font)
@@ -93,38 +186,41 @@ class CandidateWindow(QWidget):
 
         定义容器、候选词、选中状态和AI建议的样式。
         """
-        self.setStyleSheet("""
-            #candidateFrame {
-                background-color: #E9B72D;
-                border: 1px solid #D4A527;
-                border-radius: 4px;
-            }
-            #aiSuggestionFrame {
-                background-color: #E9B72D;
-                border: 1px solid #D4A527;
-                border-radius: 4px;
-            }
-            QLabel {
-                color: #000000;
-                padding: 4px 8px;
-                margin: 0px 1px;
-                background-color: transparent;
-                border-radius: 2px;
-            }
-            QLabel:hover {
-                background-color: rgba(255, 255, 255, 0.3);
-            }
-            .selected {
-                background-color: rgba(255, 255, 255, 0.5);
-                font-weight: bold;
-            }
-        """)
-    
-    def update_candidates(self, candidates: List[str], current_page: int = 0, total_pages: int = 1):
+        # 样式表为所有窗口共用的常量，选中状态通过selected动态属性匹配，运行时无需修改样式表
+        self.setStyleSheet(_CANDIDATE_QSS)
+    
+    def ensure_candidate_labels(self, count: int):
+        """确保候选词标签池中至少有count个标签。
+
+        Args:
+            count (int): 需要的标签数量。
+        """
+        for i in range(len(self.candidate_labels), count):
+            label = _CandidateLabel(i, self.on_candidate_clicked)
+            label.setObjectName(f"candidate_{i}")
+            label.hide()
+            self.candidate_labels.append(label)
+            # 插入到页码标签之前
+            self.candidate_layout.insertWidget(i, label)
+    
+    def ensure_ai_suggestion_labels(self, count: int):
+        """确保AI建议标签池中至少有count个标签。
+
+        Args:
+            count (int): 需要的标签数量。
+        """
+        for i in range(len(self.ai_suggestion_labels), count):
+            label = _CandidateLabel(i, self.on_ai_suggestion_clicked)
+            label.setObjectName(f"aiSuggestion_{i}")
+            label.hide()
+            self.ai_suggestion_labels.append(label)
+            self.ai_suggestion_layout.addWidget(label)
+    
+    def update_candidates(self, candidates: Sequence[str], current_page: int = 0, total_pages: int = 1):
         """更新候选词列表。
 
         Args:
-            candidates (List[str]): 候选词列表。
+            candidates (Sequence[str]): 候选词列表。
             current_page (int): 当前页码，默认为0。
             total_pages (int): 总页数，默认为1。
         """
@@ -133,43 +229,46 @@ class CandidateWindow(QWidget):
         self.current_page = current_page
         self.total_pages = total_pages
         
-        print(f"Updating candidates: {candidates}, Page: {current_page+1}/{total_pages}")
-        
-        # 清除现有的候选词标签
-        for label in self.candidate_labels:
-            label.deleteLater()
-        self.candidate_labels.clear()
+        # 每次按键都会调用，只在开启DEBUG日志时才格式化输出
+        if log.isEnabledFor(logging.DEBUG):
+            log.debug("Updating candidates: %s, Page: %d/%d", candidates, current_page + 1, total_pages)
         
         if not candidates:
             self.hide()
             return
         
-        # 创建新的候选词标签
-        for i, candidate in enumerate(candidates):
-            label = QLabel(f"{i+1}.{candidate}")
-            label.setObjectName(f"candidate_{i}")
-            # 使用默认参数方式捕获i的值，避免lambda闭包问题
-            label.mousePressEvent = lambda event, idx=i: self.on_candidate_clicked(idx)
+        # 批量修改标签期间暂停重绘，修改完成后只重绘一次
+        self.setUpdatesEnabled(False)
+        try:
+            # 复用标签池中的标签，多余的标签隐藏
+            self.ensure_candidate_labels(len(candidates))
+            for i, label in enumerate(self.candidate_labels):
+                if i < len(candidates):
+                    label.setText(f"{i+1}.{candidates[i]}")
+                    label.show()
+                else:
+                    label.hide()
             
-            self.candidate_labels.append(label)
-            self.candidate_layout.addWidget(label)
-        
-        # 添加页码信息
-        if total_pages > 1:
-            page_info = QLabel(f"[{current_page+1}/{total_pages}]")
-            page_info.setObjectName("page_info")
-            page_info.setStyleSheet("color: #444; font-size: 10pt;")
-            self.candidate_labels.append(page_info)
-            self.candidate_layout.addWidget(page_info)
-        
-        # 高亮第一个候选词
-        self.update_selection()
-        
-        # 调整窗口大小
-        self.adjustSize()
-        self.show()
+            # 更新页码信息
+            if total_pages > 1:
+                self.page_info_label.setText(f"[{current_page+1}/{total_pages}]")
+                self.page_info_label.show()
+            else:
+                self.page_info_label.hide()
+            
+            # 高亮第一个候选词
+            self.update_selection()
+            
+            # 调整窗口大小
+            self.candidate_layout.activate()
+            self._fit_to_contents()
+        finally:
+            self.setUpdatesEnabled(True)
+        if not self.isVisible():
+            self.show()
         
-        print(f"Candidates window shown with {len(candidates)} candidates")
+        if log.isEnabledFor(logging.DEBUG):
+            log.debug("Candidates window shown with %d candidates", len(candidates))
     
     def show_ai_suggestions(self, suggestions: List[str]):
         """显示AI建议列表。
@@ -181,28 +280,55 @@ class CandidateWindow(QWidget):
             self.ai_suggestion_frame.hide()
             return
 
+        # 流式生成时新列表是在已显示列表后追加条目，保留用户当前选中的位置
+        previous = self.ai_suggestions
+        if (self.ai_suggestion_frame.isVisible()
+                and suggestions[:len(previous)] == previous):
+            self.ai_selected_index = min(self.ai_selected_index, len(suggestions) - 1)
+        else:
+            self.ai_selected_index = 0
         self.ai_suggestions = suggestions
-        self.ai_selected_index = 0
-        
-        # 清除现有的AI建议标签
-        for label in self.ai_suggestion_labels:
-            label.deleteLater()
-        self.ai_suggestion_labels.clear()
-        
-        # 创建新的AI建议标签
-        for i, suggestion in enumerate(suggestions):
-            label = QLabel(f"{i+1}. {suggestion}")
-            label.setObjectName(f"aiSuggestion_{i}")
-            # 使用默认参数方式捕获i的值，避免lambda闭包问题
-            label.mousePressEvent = lambda event, idx=i: self.on_ai_suggestion_clicked(idx)
-            self.ai_suggestion_labels.append(label)
-            self.ai_suggestion_layout.addWidget(label)
         
-        self.ai_suggestion_frame.show()
-        self.update_ai_selection()
-        self.adjustSize()
-        self.show()
-
+        # 批量修改标签期间暂停重绘，修改完成后只重绘一次
+        self.setUpdatesEnabled(False)
+        try:
+            # 复用标签池中的标签，多余的标签隐藏
+            self.ensure_ai_suggestion_labels(len(suggestions))
+            for i, label in enumerate(self.ai_suggestion_labels):
+                if i < len(suggestions):
+                    label.setText(f"{i+1}. {suggestions[i]}")
+                    label.show()
+                else:
+                    label.hide()
+            
+            self.ai_suggestion_frame.show()
+            self.update_ai_selection()
+            self.ai_suggestion_layout.activate()
+            self._fit_to_contents()
+        finally:
+            self.setUpdatesEnabled(True)
+        if not self.isVisible():
+            self.show()
+
+    def _fit_to_contents(self):
+        """按内容调整窗口大小，尺寸没有变化时跳过，避免不必要的重新布局和重绘。"""
+        size = self.sizeHint()
+        if size != self.size():
+            self.adjustSize()
+    
+    def _refresh_screen_rect(self, *args):
+        """刷新缓存的主屏幕几何信息，并跟踪主屏幕自身的分辨率变化。"""
+        screen = QApplication.primaryScreen()
+        if screen is None:
+            self._screen_rect = None
+            return
+        if screen is not self._watched_screen:
+            if self._watched_screen is not None:
+                self._watched_screen.geometryChanged.disconnect(self._refresh_screen_rect)
+            screen.geometryChanged.connect(self._refresh_screen_rect)
+            self._watched_screen = screen
+        self._screen_rect = screen.geometry()
+    
     def on_ai_suggestion_clicked(self, index: int):
         """处理AI建议点击事件。
 
@@ -217,31 +343,48 @@ class CandidateWindow(QWidget):
     def update_selection(self):
         """更新候选词选中状态的显示。
 
-        高亮当前选中的候选词。
+        高亮当前选中的候选词，只重新应用旧选中项和新选中项两个标签的样式。
         """
-        for i, label in enumerate(self.candidate_labels):
-            if label.objectName() == "page_info":
-                continue
-                
-            if i == self.selected_index:
-                label.setProperty("class", "selected")
-            else:
-                label.setProperty("class", "")
-            label.style().unpolish(label)
-            label.style().polish(label)
+        self._last_selected = self._move_highlight(
+            self.candidate_labels, self._last_selected, self.selected_index)
     
     def update_ai_selection(self):
         """更新AI建议选中状态的显示。
 
-        高亮当前选中的AI建议。
+        高亮当前选中的AI建议，只重新应用旧选中项和新选中项两个标签的样式。
         """
-        for i, label in enumerate(self.ai_suggestion_labels):
-            if i == self.ai_selected_index:
-                label.setProperty("class", "selected")
-            else:
-                label.setProperty("class", "")
-            label.style().unpolish(label)
-            label.style().polish(label)
+        self._last_ai_selected = self._move_highlight(
+            self.ai_suggestion_labels, self._last_ai_selected, self.ai_selected_index)
+    
+    def _move_highlight(self, labels: List[QLabel], old_index: int, new_index: int) -> int:
+        """将高亮从旧的标签移动到新的标签。
+
+        Args:
+            labels (List[QLabel]): 标签列表。
+            old_index (int): 之前高亮的标签索引。
+            new_index (int): 需要高亮的标签索引。
+
+        Returns:
+            int: 当前高亮的标签索引。
+        """
+        if old_index != new_index and 0 <= old_index < len(labels):
+            self._set_label_selected(labels[old_index], False)
+        if 0 <= new_index < len(labels):
+            self._set_label_selected(labels[new_index], True)
+        return new_index
+    
+    def _set_label_selected(self, label: QLabel, selected: bool):
+        """设置标签的selected动态属性，并在状态变化时重新应用样式。
+
+        Args:
+            label (QLabel): 目标标签。
+            selected (bool): 是否选中。
+        """
+        if label.property("selected") == selected:
+            return
+        label.setProperty("selected", selected)
+        # polish会重新计算样式表规则，无需先unpolish
+        label.style().polish(label)
     
     def select_next(self) -> bool:
         """选择下一个候选词。
@@ -356,7 +499,13 @@ class CandidateWindow(QWidget):
             x (int): X坐标。
             y (int): Y坐标。
         """
-        screen = QApplication.primaryScreen().geometry()
+        screen = self._screen_rect
+        if screen is None:
+            self._refresh_screen_rect()
+            screen = self._screen_rect
+            if screen is None:
+                self.move(x, y)
+                return
         window_width = self.width()
         window_height = self.height()
         
@@ -395,52 +544,58 @@ class CandidateWindow(QWidget):
             event (QMouseEvent): 鼠标事件对象。
         """
         if event.buttons() == Qt.MouseButton.LeftButton and self.drag_position:
-            self.move(event.globalPosition().toPoint() - self.drag_position)
+            self._pending_pos = event.globalPosition().toPoint() - self.drag_position
+            if not self._move_timer.isActive():
+                self._move_timer.start()
             event.accept()
     
+    def _apply_move(self):
+        """将窗口移动到最近一次记录的拖动位置。"""
+        self.move(self._pending_pos)
+    
     def keyPressEvent(self, event):
         """处理键盘事件。
 
         支持左右键切换候选词，上下键切换AI建议。
         """
-        key = event.key()
+        key = int(event.key())
         
-        if key == Qt.Key.Key_Right:
+        if key == _KEY_RIGHT:
             if not self.ai_suggestion_frame.isVisible() and self.candidates:
                 if not self.select_next():  # 成功切换到下一个候选词
                     return
             elif self.ai_suggestion_frame.isVisible() and self.ai_suggestions:
                 self.select_next_ai()
-        elif key == Qt.Key.Key_Left:
+        elif key == _KEY_LEFT:
             if not self.ai_suggestion_frame.isVisible() and self.candidates:
                 if not self.select_previous():  # 成功切换到上一个候选词
                     return
             elif self.ai_suggestion_frame.isVisible() and self.ai_suggestions:
                 self.select_previous_ai()
-        elif key == Qt.Key.Key_Down:
+        elif key == _KEY_DOWN:
             if self.ai_suggestion_frame.isVisible():
                 self.select_next_ai()  # 只有在AI模式下才允许上下键切换
-        elif key == Qt.Key.Key_Up:
+        elif key == _KEY_UP:
             if self.ai_suggestion_frame.isVisible():
                 self.select_previous_ai()  # 只有在AI模式下才允许上下键切换
-        elif key == Qt.Key.Key_Space:
+        elif key == _KEY_SPACE:
             # 空格键确认选择
             if self.candidates and not self.ai_suggestion_frame.isVisible():
                 self.candidate_selected.emit(self.selected_index)
             elif self.ai_suggestions and self.ai_suggestion_frame.isVisible():
                 self.candidate_selected.emit(self.ai_selected_index)
-        elif key == Qt.Key.Key_Return or key == Qt.Key.Key_Enter:
+        elif key == _KEY_RETURN or key == _KEY_ENTER:
             if self.candidates and not self.ai_suggestion_frame.isVisible():
                 self.candidate_selected.emit(self.selected_index)
             elif self.ai_suggestions and self.ai_suggestion_frame.isVisible():
                 self.candidate_selected.emit(self.ai_selected_index)
-        elif key == Qt.Key.Key_Escape:
+        elif key == _KEY_ESCAPE:
             self.hide()
-        elif Qt.Key.Key_1 <= key <= Qt.Key.Key_9:
-            index = key - Qt.Key.Key_1
-            if 0 <= index < len(self.candidates):
+        elif key in _DIGIT_KEYS:
+            index = _DIGIT_KEYS[key]
+            if index < len(self.candidates):
                 self.candidate_selected.emit(index)
-            elif self.ai_suggestion_frame.isVisible() and 0 <= index < len(self.ai_suggestions):
+            elif self.ai_suggestion_frame.isVisible() and index < len(self.ai_suggestions):
                 self.candidate_selected.emit(index)
         
         super().keyPressEvent(event)
@@ -3,11 +3,53 @@
 
 该模块实现了对8105.dict.yaml文件的解析和加载，
 提供高效的拼音到汉字转换查询功能。
+rime词库的YAML头部只包含元信息，词条部分是制表符分隔的文本，
+因此直接按行解析，不依赖YAML解析器。
 """
 
-import yaml
 import os
-from typing import Dict, Optional, List, Tuple
+import hashlib
+import heapq
+import logging
+import pickle
+import sys
+from bisect import bisect_left
+from functools import lru_cache
+from operator import itemgetter
+from types import MappingProxyType
+from typing import Dict, Iterator, Mapping, Optional, List, Sequence, Tuple
+
+
+# 解析结果缓存目录；缓存数据结构变化时需要递增版本号
+CACHE_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'tabtab')
+CACHE_VERSION = 4
+
+log = logging.getLogger(__name__)
+
+# 带声调的拼音转换为不带声调的形式，ü按rime词库的习惯写作v，数字声调直接删除
+_TONE_TABLE = str.maketrans({
+    **{ch: 'a' for ch in 'āáǎà'},
+    **{ch: 'e' for ch in 'ēéěè'},
+    **{ch: 'i' for ch in 'īíǐì'},
+    **{ch: 'o' for ch in 'ōóǒò'},
+    **{ch: 'u' for ch in 'ūúǔù'},
+    **{ch: 'v' for ch in 'üǖǘǚǜ'},
+    **{ch: None for ch in '012345'},
+})
+
+
+def _normalize_pinyin(pinyin: str) -> str:
+    """去掉拼音中的声调，统一为用户输入的小写字母形式。
+    
+    Args:
+        pinyin: 去掉空格后的拼音
+        
+    Returns:
+        不带声调的拼音，已经是纯ASCII字母时原样返回
+    """
+    if pinyin.isascii() and pinyin.isalpha():
+        return pinyin
+    return pinyin.translate(_TONE_TABLE).lower()
 
 
 class DictionaryManager:
@@ -22,10 +64,18 @@ class DictionaryManager:
         Args:
             dict_paths: 词库文件路径列表，默认为assets/8105.dict.yaml和assets/41448.dict.yaml
         """
-        # word_dict 存储拼音到汉字列表的映射
-        self.word_dict: Dict[str, List[str]] = {}
-        # word_freq_dict 存储(汉字, 拼音)到词频的映射
-        self.word_freq_dict: Dict[Tuple[str, str], int] = {}
+        # word_dict 存储拼音到(汉字, 词频)列表的映射，词频与汉字放在一起，
+        # 排序和前缀匹配时无需再按(汉字, 拼音)查询词频。
+        # 加载完成后word_dict是只读的：每个拼音的词条是按词频从高到低排序的元组
+        self.word_dict: Mapping[str, Sequence[Tuple[str, int]]] = {}
+        # (汉字, 拼音)到词频的映射，首次访问word_freq_dict时才构建
+        self._word_freq_dict: Optional[Dict[Tuple[str, str], int]] = None
+        # 按字典序排序的拼音列表，用于二分查找前缀匹配的范围
+        self._sorted_keys: List[str] = []
+        # 拼音在word_dict中的插入顺序，用于保持前缀匹配结果的原有顺序
+        self._key_order: Dict[str, int] = {}
+        # 候选词查询结果缓存，词库重新加载时清空
+        self._get_candidates_cached = lru_cache(maxsize=1024)(self._compute_candidates)
         self.load_dictionaries(dict_paths)
     
     def load_dictionaries(self, dict_paths: List[str] = None):
@@ -43,10 +93,149 @@ class DictionaryManager:
                 os.path.join(current_dir, '..', 'assets', '41448.dict.yaml')
             ]
         
-        # 按顺序加载词库文件，后面的词库不会覆盖前面已存在的词条
-        for dict_path in dict_paths:
-            if os.path.exists(dict_path):
-                self.load_dictionary(dict_path)
+        dict_paths = [path for path in dict_paths if os.path.exists(path)]
+        
+        # 只有从空词库开始加载时才使用缓存，避免覆盖已加载的词条
+        cache_path = self._get_cache_path(dict_paths) if not self.word_dict else None
+        if cache_path and self._load_cache(cache_path):
+            self.build_prefix_index()
+            return
+        
+        # 按顺序解析并合并各个词库，后面的词库不会覆盖前面已存在的词条
+        for path in dict_paths:
+            self.load_dictionary(path)
+        
+        self.build_prefix_index()
+        if cache_path:
+            self._save_cache(cache_path)
+    
+    def _get_cache_path(self, dict_paths: List[str]) -> Optional[str]:
+        """根据词库文件的路径、修改时间和大小计算缓存文件路径。
+        
+        Args:
+            dict_paths: 词库文件路径列表
+            
+        Returns:
+            缓存文件路径，无法获取文件信息时返回None
+        """
+        try:
+            key = [CACHE_VERSION]
+            for path in dict_paths:
+                stat = os.stat(path)
+                key.append((os.path.abspath(path), stat.st_mtime_ns, stat.st_size))
+        except OSError:
+            return None
+        digest = hashlib.sha1(repr(key).encode('utf-8')).hexdigest()[:16]
+        return os.path.join(CACHE_DIR, f'dict-{digest}.pkl')
+    
+    def _load_cache(self, cache_path: str) -> bool:
+        """从缓存文件加载词库数据。
+        
+        Args:
+            cache_path: 缓存文件路径
+            
+        Returns:
+            加载成功返回True，缓存不存在或已损坏返回False
+        """
+        try:
+            with open(cache_path, 'rb') as f:
+                # 缓存中保存的是已排序的只读词条
+                self.word_dict = MappingProxyType(pickle.load(f))
+            return True
+        except FileNotFoundError:
+            return False
+        except Exception as e:
+            log.warning("Dictionary cache is invalid, rebuilding: %s", e)
+            self.word_dict = {}
+            return False
+    
+    def _save_cache(self, cache_path: str):
+        """将词库数据写入缓存文件。
+        
+        Args:
+            cache_path: 缓存文件路径
+        """
+        try:
+            os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+            # 先写临时文件再替换，避免中途失败留下不完整的缓存
+            tmp_path = f'{cache_path}.{os.getpid()}.tmp'
+            with open(tmp_path, 'wb') as f:
+                pickle.dump(dict(self.word_dict), f, protocol=5)
+            os.replace(tmp_path, cache_path)
+        except OSError as e:
+            log.warning("Failed to write dictionary cache: %s", e)
+    
+    def build_prefix_index(self):
+        """根据当前的word_dict重建前缀查询索引，并将word_dict冻结为只读。
+        
+        单独调用load_dictionary加载词库后，需要调用此方法使前缀查询生效。
+        """
+        if not isinstance(self.word_dict, MappingProxyType):
+            # 词条按词频从高到低排序（词频相同时保持加载顺序），查询时无需再排序
+            by_freq = itemgetter(1)
+            self.word_dict = MappingProxyType({
+                pinyin: tuple(sorted(entries, key=by_freq, reverse=True))
+                for pinyin, entries in self.word_dict.items()
+            })
+        self._sorted_keys = sorted(self.word_dict)
+        self._key_order = {pinyin: i for i, pinyin in enumerate(self.word_dict)}
+        self._word_freq_dict = None
+        self._get_candidates_cached.cache_clear()
+    
+    @property
+    def word_freq_dict(self) -> Dict[Tuple[str, str], int]:
+        """(汉字, 拼音)到词频的映射，按需从word_dict构建。"""
+        if self._word_freq_dict is None:
+            freq_dict: Dict[Tuple[str, str], int] = {}
+            for pinyin, entries in self.word_dict.items():
+                for hanzi, freq in entries:
+                    freq_dict[(hanzi, pinyin)] = freq
+            self._word_freq_dict = freq_dict
+        return self._word_freq_dict
+    
+    def get_prefix_keys(self, prefix: str) -> List[str]:
+        """获取以prefix开头的所有拼音，按加载顺序排列。
+        
+        Args:
+            prefix: 拼音前缀
+            
+        Returns:
+            以prefix开头的拼音列表
+        """
+        keys = self._sorted_keys
+        start = bisect_left(keys, prefix)
+        end = start
+        while end < len(keys) and keys[end].startswith(prefix):
+            end += 1
+        matched = keys[start:end]
+        matched.sort(key=self._key_order.__getitem__)
+        return matched
+    
+    def iter_prefix_entries(self, text: str, start: int) -> Iterator[Tuple[int, str, Sequence[Tuple[str, int]]]]:
+        """从text[start]开始逐个字符延长拼音，依次返回词库中存在的拼音及其词条。
+        
+        延长后的拼音已经不是任何词库拼音的前缀时停止，不再检查更长的子串。
+        拼音每延长一个字符都只会更大，二分查找从上一次的位置继续。
+        
+        Args:
+            text: 拼音字符串
+            start: 起始位置
+            
+        Yields:
+            (结束位置, 拼音, 按词频从高到低排序的(汉字, 词频)元组)
+        """
+        keys = self._sorted_keys
+        word_dict = self.word_dict
+        count = len(keys)
+        lo = 0
+        for end in range(start + 1, len(text) + 1):
+            sub = text[start:end]
+            lo = bisect_left(keys, sub, lo)
+            if lo == count or not keys[lo].startswith(sub):
+                return
+            entries = word_dict.get(sub)
+            if entries:
+                yield end, sub, entries
     
     def load_dictionary(self, dict_path: str):
         """加载单个词库文件。
@@ -54,49 +243,91 @@ class DictionaryManager:
         Args:
             dict_path: 词库文件路径
         """
+        parsed = self._parse_dictionary(dict_path)
+        if parsed is not None:
+            self._merge_dictionary(parsed)
+    
+    @staticmethod
+    def _parse_dictionary(dict_path: str) -> Optional[Dict[str, List[Tuple[str, int]]]]:
+        """解析单个词库文件，不修改当前已加载的词库。
+        
+        Args:
+            dict_path: 词库文件路径
+            
+        Returns:
+            拼音到(汉字, 词频)列表的映射，解析失败时返回None
+        """
+        word_dict: Dict[str, List[Tuple[str, int]]] = {}
+        # 已添加的(汉字, 拼音)，只在解析期间用于查重
+        seen = set()
         try:
-            with open(dict_path, 'r', encoding='utf-8') as f:
-                content = f.read()
-                
-            # 分离YAML头部和词条数据
-            parts = content.split('...\n', 1)
-            if len(parts) < 2:
-                print(f"Warning: Invalid dictionary format in {dict_path}")
-                return
+            with open(dict_path, 'r', encoding='utf-8', buffering=1 << 20) as f:
+                # 跳过YAML头部，直到遇到"..."分隔行
+                for line in f:
+                    if line.rstrip() == '...':
+                        break
+                else:
+                    log.warning("Invalid dictionary format in %s", dict_path)
+                    return None
                 
-            # 解析词条数据
-            word_lines = parts[1].strip().split('\n')
-            for line in word_lines:
-                line = line.strip()
-                if not line or line.startswith('#'):
-                    continue
-                    
-                parts = line.split('\t')
-                if len(parts) >= 2:
-                    hanzi = parts[0]
-                    pinyin_with_spaces = parts[1]
-                    pinyin = pinyin_with_spaces.replace(" ", "")
-                    
-                    # 如果有词频信息
-                    freq = 1
-                    if len(parts) >= 3:
-                        try:
-                            freq = int(parts[2])
-                        except ValueError:
-                            pass
-                    
-                    if pinyin not in self.word_dict:
-                        self.word_dict[pinyin] = []
-                    
-                    # 避免重复添加相同的汉字
-                    if hanzi not in self.word_dict[pinyin]:
-                        self.word_dict[pinyin].append(hanzi)
-                        self.word_freq_dict[(hanzi, pinyin)] = freq
+                # 逐行解析词条数据，不再把整个文件读入内存
+                for line in f:
+                    line = line.strip()
+                    if not line or line.startswith('#'):
+                        continue
+                        
+                    parts = line.split('\t', 3)
+                    if len(parts) >= 2:
+                        # 同一个汉字和拼音会在多个词库、多个词条中重复出现，
+                        # 驻留后所有重复出现的字符串共用一个对象
+                        hanzi = sys.intern(parts[0])
+                        pinyin_with_spaces = parts[1]
+                        # 词库中的拼音可能带有声调，加载时统一去掉，查询时无需再处理
+                        pinyin = sys.intern(_normalize_pinyin(pinyin_with_spaces.replace(" ", "")))
+                        
+                        # 如果有词频信息
+                        freq = 1
+                        if len(parts) >= 3:
+                            try:
+                                freq = int(parts[2])
+                            except ValueError:
+                                pass
+                        
+                        # 避免重复添加相同的汉字，用集合做O(1)的查重，代替在列表中线性查找
+                        key = (hanzi, pinyin)
+                        if key not in seen:
+                            seen.add(key)
+                            word_dict.setdefault(pinyin, []).append((hanzi, freq))
                     
         except FileNotFoundError:
-            print(f"Dictionary file not found: {dict_path}")
+            log.error("Dictionary file not found: %s", dict_path)
+            return None
         except Exception as e:
-            print(f"Error loading dictionary {dict_path}: {e}")
+            log.error("Error loading dictionary %s: %s", dict_path, e)
+            return None
+        return word_dict
+    
+    def _merge_dictionary(self, word_dict: Dict[str, List[Tuple[str, int]]]):
+        """将解析出的词库并入当前词库，已存在的词条不会被覆盖。
+        
+        Args:
+            word_dict: 拼音到(汉字, 词频)列表的映射
+        """
+        self._word_freq_dict = None
+        # 当前词库为空时直接采用解析结果，省去逐条合并
+        if not self.word_dict:
+            self.word_dict = word_dict
+            return
+        
+        # 已冻结的词库是只读的，合并到一份新的可变副本中
+        merged = dict(self.word_dict)
+        for pinyin, entries in word_dict.items():
+            current = merged.get(pinyin, ())
+            existing = {hanzi for hanzi, _ in current}
+            added = [(hanzi, freq) for hanzi, freq in entries if hanzi not in existing]
+            if added:
+                merged[pinyin] = [*current, *added]
+        self.word_dict = merged
     
     def lookup(self, pinyin_str: str) -> Optional[List[str]]:
         """查询拼音对应的汉字列表。
@@ -107,7 +338,10 @@ class DictionaryManager:
         Returns:
             对应的汉字列表，如果未找到则返回None
         """
-        return self.word_dict.get(pinyin_str)
+        entries = self.word_dict.get(pinyin_str)
+        if not entries:
+            return None
+        return [hanzi for hanzi, _ in entries]
     
     def get_word_frequency(self, hanzi: str, pinyin: str) -> int:
         """获取词语的词频。
@@ -131,28 +365,47 @@ class DictionaryManager:
         Returns:
             候选词列表，按词频从高到低排序
         """
+        return list(self._get_candidates_cached(pinyin_str, max_count))
+    
+    def _compute_candidates(self, pinyin_str: str, max_count: int) -> Tuple[str, ...]:
+        """计算拼音的候选词，结果由get_candidates缓存。
+        
+        Args:
+            pinyin_str: 拼音字符串
+            max_count: 最大返回数量
+            
+        Returns:
+            候选词元组，按词频从高到低排序
+        """
         candidates = []
         
-        # 精确匹配
-        exact_matches = self.lookup(pinyin_str)
+        # 精确匹配，词条在加载时已按词频排序
+        exact_matches = self.word_dict.get(pinyin_str)
         if exact_matches:
-            # 按词频排序
-            exact_matches.sort(key=lambda x: self.get_word_frequency(x, pinyin_str), reverse=True)
-            candidates.extend(exact_matches)
-        
-        # 前缀匹配
-        prefix_matches = []
-        for pinyin, hanzi_list in self.word_dict.items():
-            if pinyin.startswith(pinyin_str):
-                for hanzi in hanzi_list:
-                    if hanzi not in candidates:  # 避免重复
-                        prefix_matches.append((hanzi, self.get_word_frequency(hanzi, pinyin)))
-        
-        # 按词频排序前缀匹配结果
-        prefix_matches.sort(key=lambda x: x[1], reverse=True)
-        candidates.extend([hanzi for hanzi, freq in prefix_matches])
-        
-        return candidates[:max_count] if max_count > 0 else candidates
+            candidates.extend(hanzi for hanzi, _ in exact_matches)
+        
+        # 前缀匹配：同一个字可能出现在多个拼音下，只保留词频最高的一次（词频相同时保留先出现的）
+        seen = set(candidates)
+        best: Dict[str, Tuple[int, int]] = {}
+        position = 0
+        for pinyin in self.get_prefix_keys(pinyin_str):
+            for hanzi, freq in self.word_dict[pinyin]:
+                if hanzi in seen:  # 避免与精确匹配重复
+                    continue
+                previous = best.get(hanzi)
+                if previous is None or freq > previous[0]:
+                    best[hanzi] = (freq, -position)
+                position += 1
+        
+        # 按词频排序前缀匹配结果；限制数量时只需取出词频最高的若干个，无需完整排序
+        rank = best.__getitem__
+        if max_count > 0:
+            remaining = max(max_count - len(candidates), 0)
+            candidates.extend(heapq.nlargest(remaining, best, key=rank))
+        else:
+            candidates.extend(sorted(best, key=rank, reverse=True))
+        
+        return tuple(candidates[:max_count] if max_count > 0 else candidates)
 
 
 if __name__ == '__main__':
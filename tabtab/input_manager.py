@@ -5,20 +5,80 @@
 候选词显示和文本输入等功能。
 """
 
-import pyautogui
 import ctypes
 import time
 from pynput import keyboard
-from PyQt6.QtCore import QObject, pyqtSignal, QTimer
+from PyQt6.QtCore import Qt, QObject, pyqtSignal, QTimer
 from PyQt6.QtWidgets import QApplication
-from typing import List, Optional
+from typing import Deque, List, Optional, Sequence, Tuple
 
 
 from pinyin_engine import PinyinEngine
 from candidate_window import CandidateWindow
-from keyboard_listener import KeyboardListenerThread, is_alpha_char, is_digit_char, get_key_char
+from keyboard_listener import KeyboardListener, classify_key
 from ai_engine import AIEngine
+import win_input
 import re
+import logging
+from collections import deque
+from enum import IntEnum
+
+log = logging.getLogger(__name__)
+
+
+# 发送给AI的文本中需要移除的字符：除字母、数字、空白和常见标点符号以外的字符
+_CLEAN_RE = re.compile(r'[^\w\s.,!?]')
+# 纯ASCII文本使用translate删除字符，删除表由上面的正则逐个判定生成，两者结果一致
+_ASCII_STRIP_TABLE = {c: None for c in range(128) if _CLEAN_RE.match(chr(c))}
+
+
+class Mode(IntEnum):
+    """输入法当前所处的状态。"""
+    IDLE = 0  # 未激活
+    PINYIN = 1  # 正在输入拼音，拼音缓冲区非空
+    AI = 2  # 显示AI补全结果，补全结果非空
+
+
+class _POINT(ctypes.Structure):
+    _fields_ = [("x", ctypes.c_long), ("y", ctypes.c_long)]
+
+
+def _load_get_cursor_pos():
+    """获取user32.GetCursorPos函数，非Windows平台返回None。"""
+    try:
+        get_cursor_pos = ctypes.windll.user32.GetCursorPos
+    except AttributeError:
+        return None
+    get_cursor_pos.argtypes = (ctypes.POINTER(_POINT),)
+    get_cursor_pos.restype = ctypes.c_int
+    return get_cursor_pos
+
+
+# 获取光标位置的函数和结果结构体只创建一次；只在GUI线程中使用，可以复用同一个实例
+_GetCursorPos = _load_get_cursor_pos()
+_cursor_point = _POINT()
+
+# pyautogui只在SendInput不可用时作为备用输入方式，第一次使用时才导入
+_pyautogui = None
+
+
+def _get_pyautogui():
+    """按需导入并配置pyautogui。
+    
+    导入pyautogui会一并初始化截图、鼠标等与输入法无关的模块，
+    Windows上正常情况下用不到，推迟到第一次需要时再导入。
+    
+    Returns:
+        pyautogui模块
+    """
+    global _pyautogui
+    if _pyautogui is None:
+        import pyautogui
+        # 取消每次调用后的全局等待，需要按键间隔的地方通过interval参数单独指定
+        pyautogui.PAUSE = 0
+        pyautogui.FAILSAFE = False
+        _pyautogui = pyautogui
+    return _pyautogui
 
 
 class InputManager(QObject):
@@ -35,47 +95,63 @@ class InputManager(QObject):
         
         # 连接AI引擎信号
         self.ai_engine.completions_ready.connect(self.on_ai_completions_ready)
+        self.ai_engine.partial_ready.connect(self.on_ai_completions_ready)
         self.ai_engine.error_occurred.connect(self.on_ai_error)
         
         # 输入状态
         self.pinyin_buffer = ""  # 拼音缓冲区
-        self.candidates: List[str] = []  # 当前候选词
-        self.full_candidates: List[str] = []  # 完整候选词列表
+        self.candidates: Sequence[str] = ()  # 当前候选词
+        self.full_candidates: Tuple[str, ...] = ()  # 完整候选词列表
+        self._pages: List[Tuple[str, ...]] = []  # 按页切分好的候选词
+        self._total_pages = 0  # 总页数
+        # 当前缓冲区各个前缀的(拼音, 候选词)，退格时直接复用之前的结果
+        self._candidate_path: List[Tuple[str, Tuple[str, ...]]] = []
         self.current_page = 0  # 当前页码
         self.page_size = 5  # 每页显示数量
-        self.is_active = False  # 输入法是否激活
+        self._mode = Mode.IDLE  # 输入状态，在状态切换时更新
         self.suppress_next_key = False  # 是否阻止下一个按键
         
         # AI补全状态
         self.ai_completions: List[str] = []  # AI补全结果
-        self.is_ai_mode = False  # 是否处于AI补全模式
         self.last_ai_request_time = 0  # 上次AI请求时间
         self.ai_request_cooldown = 3  # AI请求冷却时间（秒）
         
-        # 最近输入内容跟踪
-        self.last_input_text = ""  # 最近一次输入的文本
-        self.last_input_pinyin = ""  # 最近一次输入的拼音
+        # 最近输入内容跟踪：保留最近几次输入的(拼音, 文本)，作为AI补全的上下文
+        self.history_size = 8
+        self._history: Deque[Tuple[str, str]] = deque(maxlen=self.history_size)
         
         # 双击Tab检测相关
         self.last_tab_time = 0  # 上次Tab按键时间戳
         self.tab_double_click_interval = 0.3  # 双击时间间隔阈值（秒）
         
-        # 键盘监听
-        self.keyboard_listener = KeyboardListenerThread()
-        self.keyboard_listener.key_pressed.connect(self.on_key_press)
+        # 光标位置缓存：连续输入时候选窗口在短时间内复用上次查询到的位置
+        self._cursor_pos: Optional[Tuple[int, int]] = None
+        self._cursor_pos_time = 0.0
+        self.cursor_refresh_interval = 0.05  # 光标位置刷新间隔（秒）
+        
+        # 候选词更新防抖：快速连续输入时只计算最后一次的候选词
+        self._update_delay_ms = 40
+        self._update_timer = QTimer(self)
+        self._update_timer.setSingleShot(True)
+        self._update_timer.setInterval(self._update_delay_ms)
+        self._update_timer.timeout.connect(self._do_update_candidates)
+        
+        # 键盘监听：按键事件在pynput的监听线程中发出，通过队列连接投递到GUI线程的事件循环中处理，
+        # 监听线程发出信号后立即返回，不会因候选词计算和界面更新而阻塞系统的键盘钩子
+        self.keyboard_listener = KeyboardListener()
+        self.keyboard_listener.key_pressed.connect(self.on_key_press, Qt.ConnectionType.QueuedConnection)
         
         # 连接候选词窗口信号
         self.candidate_window.candidate_selected.connect(self.on_candidate_selected)
         self.candidate_window.page_change_requested.connect(self.handle_page_change)
         
-        # 设置pyautogui的延迟，提高输入速度
-        pyautogui.PAUSE = 0.01
-        pyautogui.FAILSAFE = False
+        # 根据平台能力选定文本输入方式，只探测一次
+        self._input_text_impl = self._select_input_text_impl()
     
     def start(self):
         """启动输入法。"""
         print("Starting TabTab Input Method...")
-        self.keyboard_listener.start()
+        self.keyboard_listener.start_listening()
         print("TabTab Input Method is running. Press Ctrl+C to stop.")
     
     def stop(self):
@@ -85,65 +161,13 @@ class InputManager(QObject):
         self.candidate_window.hide()
         print("TabTab Input Method stopped.")
     
-    def should_suppress_key(self, key) -> bool:
-        """判断是否应该阻止按键传播到其他应用程序。
-        
-        Args:
-            key: 按下的键
-            
-        Returns:
-            True如果应该阻止，False如果允许传播
-        """
-        # 如果在AI模式下，阻止相关按键
-        if self.is_ai_mode and self.ai_completions:
-            # 阻止数字键1-9
-            if is_digit_char(key):
-                digit = int(get_key_char(key))
-                if 1 <= digit <= len(self.ai_completions):
-                    return True
-            
-            # 阻止空格键、回车键
-            if key in [keyboard.Key.space, keyboard.Key.enter]:
-                return True
-
-            # 阻止方向键
-            if key in [keyboard.Key.left, keyboard.Key.right, keyboard.Key.up, keyboard.Key.down]:
-                return True
-        
-        # 如果输入法激活且有候选词，阻止某些按键
-        if self.is_active and self.candidates:
-            # 阻止数字键1-9
-            if is_digit_char(key):
-                digit = int(get_key_char(key))
-                if 1 <= digit <= len(self.candidates):
-                    return True
-            
-            # 阻止空格键、回车键（注意：不再阻止Tab键）
-            if key in [keyboard.Key.space, keyboard.Key.enter]:
-                return True
-
-            # 阻止方向键
-            if key in [keyboard.Key.left, keyboard.Key.right, keyboard.Key.up, keyboard.Key.down]:
-                return True
-        
-        # 如果输入法激活，阻止字母键
-        if self.is_active and is_alpha_char(key):
-            return True
-            
-        # 如果输入法激活，阻止退格键和ESC键
-        if self.is_active and key in [keyboard.Key.backspace, keyboard.Key.esc]:
-            return True
-            
-        return False
-    
     def next_page(self) -> bool:
         """翻到下一页。
         
         Returns:
             成功翻页返回True，否则返回False
         """
-        max_page = (len(self.full_candidates) + self.page_size - 1) // self.page_size - 1
-        if self.current_page < max_page:
+        if self.current_page < self._total_pages - 1:
             self.current_page += 1
             self.show_current_page_candidates()
             return True
@@ -180,9 +204,11 @@ class InputManager(QObject):
         print("Tab键双击事件触发")
         # 检查是否满足AI请求条件
         text_for_ai = ""
+        # 最近输入的文本作为上下文
+        context = " ".join(text for _, text in self._history)
         
         # 优先使用当前激活的输入
-        if self.is_active and self.pinyin_buffer:
+        if self.pinyin_buffer:
             # 使用当前选中的候选词而不是总是第一个候选词
             selected_candidate = self.candidate_window.get_selected_candidate() if self.candidates else ""
             if not selected_candidate and self.candidates:
@@ -190,15 +216,10 @@ class InputManager(QObject):
                 if 0 <= self.candidate_window.selected_index < len(self.candidates):
                     selected_candidate = self.candidates[self.candidate_window.selected_index]
             
-            text_for_ai = f"{self.pinyin_buffer} {selected_candidate}"
-        # 如果没有当前输入，尝试使用最近输入的内容
-        elif self.last_input_text:
-            # 如果有最近输入的拼音，使用拼音+文本
-            if self.last_input_pinyin:
-                text_for_ai = f"{self.last_input_pinyin} {self.last_input_text}"
-            else:
-                # 否则只使用最近输入的文本
-                text_for_ai = self.last_input_text
+            text_for_ai = f"{context} {self.pinyin_buffer} {selected_candidate}".lstrip()
+        # 如果没有当前输入，使用最近输入的内容
+        elif context:
+            text_for_ai = context
         else:
             print("没有激活的输入或最近输入内容，无法请求AI补全")
             return
@@ -216,21 +237,21 @@ class InputManager(QObject):
         text_for_ai = self.clean_text_for_ai(text_for_ai)
         print(f"请求AI补全: '{text_for_ai}'")
         
-        # 请求AI补全
-        self.ai_engine.get_completions(text_for_ai)
+        # 请求AI补全；双击Tab是用户主动触发的，跳过防抖立即请求
+        self.ai_engine.get_completions(text_for_ai, immediate=True)
 
     def on_ai_completions_ready(self, completions: List[str]):
-        """处理AI补全结果。
+        """处理AI补全结果，流式生成过程中已经完整的条目也通过这里先显示出来。
 
         Args:
             completions: AI返回的补全结果列表
         """
         print(f"AI补全结果: {completions}")
         self.ai_completions = completions
-        self.is_ai_mode = True
         
         # 更新候选窗口显示AI补全结果
         if self.ai_completions:
+            self._mode = Mode.AI
             self.candidate_window.show_ai_suggestions(self.ai_completions)
             self.move_candidate_window()
 
@@ -250,231 +271,344 @@ class InputManager(QObject):
             key: 按下的键
         """
         try:
-            print(f"Key pressed: {key}, Type: {type(key)}")
-            print(f"Input state - Active: {self.is_active}, Buffer: '{self.pinyin_buffer}', Candidates: {len(self.candidates)}")
+            # 每次按键都会调用，只在开启DEBUG日志时才格式化输出
+            if log.isEnabledFor(logging.DEBUG):
+                log.debug("Key pressed: %s, Type: %s", key, type(key))
+                log.debug("Input state - Mode: %s, Buffer: '%s', Candidates: %d",
+                          self._mode.name, self.pinyin_buffer, len(self.candidates))
             
-            # 检查是否应该阻止按键
-            suppress_key = self.should_suppress_key(key)
+            # 按键的字符和类型只判断一次，后续处理都复用这些结果
+            char, is_digit, is_alpha = classify_key(key)
+            
+            # 非字母键可能会用到当前的候选词，先完成等待中的候选词更新
+            if not is_alpha:
+                self.flush_pending_update()
+            
+            # 各分支的返回值就是是否阻止按键
+            mode = self._mode
             
             # 处理数字键（选择候选词）
-            if is_digit_char(key):
-                if (self.is_active and self.candidates) or (self.is_ai_mode and self.ai_completions):
-                    digit = int(get_key_char(key))
-                    print(f"Digit key pressed: {digit}")
-                    if self.is_ai_mode and self.ai_completions and 1 <= digit <= len(self.ai_completions):
-                        print(f"Selecting AI completion {digit-1}: {self.ai_completions[digit-1]}")
-                        self.select_candidate(digit - 1)
-                        return True  # 阻止数字键传播
-                    elif self.is_active and self.candidates and 1 <= digit <= len(self.candidates):
-                        print(f"Selecting candidate {digit-1}: {self.candidates[digit-1]}")
-                        self.select_candidate(digit - 1)
-                        return True  # 阻止数字键传播
-                # 如果输入法未激活或没有候选词，则不处理，让数字键正常输入
+            if is_digit:
+                if mode == Mode.AI:
+                    options = self.ai_completions
+                elif mode == Mode.PINYIN:
+                    options = self.candidates
+                else:
+                    options = ()
+                digit = int(char)
+                if 1 <= digit <= len(options):
+                    log.debug("Selecting %s option %d: %s", mode.name, digit - 1, options[digit - 1])
+                    self.select_candidate(digit - 1)
+                    return True  # 阻止数字键传播
+                # 如果输入法未激活或没有对应的候选词，则不处理，让数字键正常输入
                 return False
 
             # 处理字母键（拼音输入）
-            if is_alpha_char(key):
+            if is_alpha:
+                # 继续输入后之前的AI请求已经过期，立即取消
+                self.ai_engine.abort_current()
                 # 如果在AI模式下，先退出AI模式
-                if self.is_ai_mode:
+                if mode == Mode.AI:
                     self.exit_ai_mode()
                     
-                char = get_key_char(key).lower()
+                char = char.lower()
                 self.pinyin_buffer += char
+                self._mode = Mode.PINYIN
                 self.update_candidates()
-                self.is_active = True
-                print(f"Added char '{char}' to buffer: '{self.pinyin_buffer}'")
-                return suppress_key
+                log.debug("Added char '%s' to buffer: '%s'", char, self.pinyin_buffer)
+                # 输入法已激活时阻止字母键，第一个字母让其正常输入
+                return mode != Mode.IDLE
             
-            # 处理方向键（选择候选词和翻页）
-            elif key == keyboard.Key.left:
-                if self.is_active and self.candidates:
-                    # 在AI模式下，只处理AI建议的选择
-                    if self.is_ai_mode and self.ai_completions:
-                        if not self.candidate_window.select_previous_ai():
-                            return True
-                    # 在普通模式下，处理候选词选择和翻页
-                    elif not self.is_ai_mode:
-                        # 检查是否在第一页的第一个候选词，如果不是，则正常选择上一个
-                        if not self.candidate_window.is_at_beginning():
-                            self.candidate_window.select_previous()
-                            return True
-                        # 如果在第一页的第一个候选词，尝试翻到上一页
-                        elif self.current_page > 0:
-                            if self.previous_page():
-                                self.candidate_window.select_last()
-                                return True
-                return False
-                
-            elif key == keyboard.Key.right:
-                if self.is_active and self.candidates:
-                    # 在AI模式下，只处理AI建议的选择
-                    if self.is_ai_mode and self.ai_completions:
-                        if not self.candidate_window.select_next_ai():
-                            return True
-                    # 在普通模式下，处理候选词选择和翻页
-                    elif not self.is_ai_mode:
-                        # 检查是否在最后一页的最后一个候选词，如果不是，则正常选择下一个
-                        if not self.candidate_window.is_at_end():
-                            self.candidate_window.select_next()
-                            return True
-                        # 如果在最后一页的最后一个候选词，尝试翻到下一页
-                        else:
-                            max_page = (len(self.full_candidates) + self.page_size - 1) // self.page_size - 1
-                            if self.current_page < max_page:
-                                if self.next_page():
-                                    self.candidate_window.select_first()
-                                    return True
-                return False
-                
-            elif key == keyboard.Key.up:
-                if self.is_ai_mode and self.ai_completions:
-                    self.candidate_window.select_previous_ai()
-                    return True
-                return False
-                
-            elif key == keyboard.Key.down:
-                if self.is_ai_mode and self.ai_completions:
-                    self.candidate_window.select_next_ai()
-                    return True
-                return False
+            # 功能键（方向键、Tab、空格、回车、退格、ESC）通过分发表交给对应的处理方法
+            handler = _KEY_DISPATCH.get(key)
+            if handler is not None:
+                return handler(self)
             
-            # 处理Tab键（仅处理双击Tab）
-            elif key == keyboard.Key.tab:
-                print(f"Tab key pressed - Active: {self.is_active}, Candidates: {len(self.candidates)}")
-                
-                # 检测双击Tab事件
-                current_time = time.time()
-                if (current_time - self.last_tab_time) < self.tab_double_click_interval:
-                    # 双击Tab事件
-                    self.handle_tab_double_click()
-                    self.last_tab_time = 0  # 重置时间，避免连续触发
-                    # 双击Tab时不自动输入候选词，直接返回
-                    return True
-                
-                # 单击Tab事件，记录时间
-                self.last_tab_time = current_time
-                
-                # 单击Tab不再确认候选词，直接返回
-                print("Tab key - single click, no action")
-                return False  # 让Tab键正常传播
-            
-            # 处理空格键（确认第一个候选词或输入空格）
-            elif key == keyboard.Key.space:
-                if self.is_ai_mode and self.ai_completions:
-                    print(f"Space selecting first AI completion: {self.ai_completions[0]}")
-                    self.select_candidate(0)
-                    return True  # 阻止空格键传播
-                elif self.is_active and self.candidates:
-                    print(f"Space selecting first candidate: {self.candidates[0]}")
-                    self.select_candidate(0)
-                    return True  # 阻止空格键传播
-                else:
-                    # 让空格键正常传播（输入空格）
-                    return False
-            
-            # 处理回车键（确认第一个候选词或换行）
-            elif key == keyboard.Key.enter:
-                if self.is_ai_mode and self.ai_completions:
-                    self.select_candidate(0)
-                    return True  # 阻止回车键传播
-                elif self.is_active and self.candidates:
+            # 其他键（如标点符号等）
+            # 如果在AI模式下，退出AI模式
+            if mode == Mode.AI:
+                self.exit_ai_mode()
+            elif mode == Mode.PINYIN:
+                # 如果正在输入拼音，先确认第一个候选词，然后输入字符
+                if self.candidates:
                     self.select_candidate(0)
-                    return True  # 阻止回车键传播
-                else:
-                    # 让回车键正常传播
-                    return False
-            
-            # 处理退格键
-            elif key == keyboard.Key.backspace:
-                # 如果在AI模式下，退出AI模式
-                if self.is_ai_mode:
-                    self.exit_ai_mode()
-                    return True  # 阻止退格键传播
-                elif self.is_active and self.pinyin_buffer:
-                    self.pinyin_buffer = self.pinyin_buffer[:-1]
-                    self.update_candidates()
-                    if not self.pinyin_buffer:
-                        self.deactivate()
-                    return True  # 阻止退格键传播
                 else:
-                    # 让退格键正常传播
-                    return False
-            
-            # 处理ESC键（取消输入）
-            elif key == keyboard.Key.esc:
-                # 如果在AI模式下，退出AI模式
-                if self.is_ai_mode:
-                    self.exit_ai_mode()
-                    return True  # 阻止ESC键传播
-                elif self.is_active:
                     self.deactivate()
-                    return True  # 阻止ESC键传播
-                else:
-                    return False
             
-            # 其他键（如标点符号等）
-            else:
-                # 如果在AI模式下，退出AI模式
-                if self.is_ai_mode:
-                    self.exit_ai_mode()
-                elif self.is_active:
-                    # 如果正在输入拼音，先确认第一个候选词，然后输入字符
-                    if self.candidates:
-                        self.select_candidate(0)
-                    else:
-                        self.deactivate()
-                
-                # 让其他键正常传播
-                return False
-                
-            return suppress_key
+            # 让其他键正常传播
+            return False
         
         except Exception as e:
-            print(f"Error handling key press: {e}")
+            log.error("Error handling key press: %s", e)
+            return False
+    
+    def _handle_left(self) -> bool:
+        """处理左方向键（选择候选词和翻页）。
+        
+        Returns:
+            True如果应该阻止按键传播
+        """
+        mode = self._mode
+        # 在AI模式下，只处理AI建议的选择
+        if mode == Mode.AI:
+            if not self.candidate_window.select_previous_ai():
+                return True
+        # 在普通模式下，处理候选词选择和翻页
+        elif mode == Mode.PINYIN and self.candidates:
+            # 检查是否在第一页的第一个候选词，如果不是，则正常选择上一个
+            if not self.candidate_window.is_at_beginning():
+                self.candidate_window.select_previous()
+                return True
+            # 如果在第一页的第一个候选词，尝试翻到上一页
+            elif self.current_page > 0:
+                if self.previous_page():
+                    self.candidate_window.select_last()
+                    return True
+        return False
+    
+    def _handle_right(self) -> bool:
+        """处理右方向键（选择候选词和翻页）。
+        
+        Returns:
+            True如果应该阻止按键传播
+        """
+        mode = self._mode
+        # 在AI模式下，只处理AI建议的选择
+        if mode == Mode.AI:
+            if not self.candidate_window.select_next_ai():
+                return True
+        # 在普通模式下，处理候选词选择和翻页
+        elif mode == Mode.PINYIN and self.candidates:
+            # 检查是否在最后一页的最后一个候选词，如果不是，则正常选择下一个
+            if not self.candidate_window.is_at_end():
+                self.candidate_window.select_next()
+                return True
+            # 如果在最后一页的最后一个候选词，尝试翻到下一页
+            else:
+                if self.current_page < self._total_pages - 1:
+                    if self.next_page():
+                        self.candidate_window.select_first()
+                        return True
+        return False
+    
+    def _handle_up(self) -> bool:
+        """处理上方向键（选择AI建议）。
+        
+        Returns:
+            True如果应该阻止按键传播
+        """
+        if self._mode == Mode.AI:
+            self.candidate_window.select_previous_ai()
+            return True
+        return False
+    
+    def _handle_down(self) -> bool:
+        """处理下方向键（选择AI建议）。
+        
+        Returns:
+            True如果应该阻止按键传播
+        """
+        if self._mode == Mode.AI:
+            self.candidate_window.select_next_ai()
+            return True
+        return False
+    
+    def _handle_tab(self) -> bool:
+        """处理Tab键（仅处理双击Tab）。
+        
+        Returns:
+            True如果应该阻止按键传播
+        """
+        log.debug("Tab key pressed - Mode: %s, Candidates: %d", self._mode.name, len(self.candidates))
+        
+        # 检测双击Tab事件
+        current_time = time.time()
+        if (current_time - self.last_tab_time) < self.tab_double_click_interval:
+            # 双击Tab事件
+            self.handle_tab_double_click()
+            self.last_tab_time = 0  # 重置时间，避免连续触发
+            # 双击Tab时不自动输入候选词，直接返回
+            return True
+        
+        # 单击Tab事件，记录时间
+        self.last_tab_time = current_time
+        
+        # 单击Tab不再确认候选词，直接返回
+        log.debug("Tab key - single click, no action")
+        return False  # 让Tab键正常传播
+    
+    def _handle_space(self) -> bool:
+        """处理空格键（确认第一个候选词或输入空格）。
+        
+        Returns:
+            True如果应该阻止按键传播
+        """
+        mode = self._mode
+        if mode == Mode.AI:
+            log.debug("Space selecting first AI completion: %s", self.ai_completions[0])
+            self.select_candidate(0)
+            return True  # 阻止空格键传播
+        elif mode == Mode.PINYIN and self.candidates:
+            log.debug("Space selecting first candidate: %s", self.candidates[0])
+            self.select_candidate(0)
+            return True  # 阻止空格键传播
+        else:
+            # 让空格键正常传播（输入空格）
+            return False
+    
+    def _handle_enter(self) -> bool:
+        """处理回车键（确认第一个候选词或换行）。
+        
+        Returns:
+            True如果应该阻止按键传播
+        """
+        mode = self._mode
+        if mode == Mode.AI:
+            self.select_candidate(0)
+            return True  # 阻止回车键传播
+        elif mode == Mode.PINYIN and self.candidates:
+            self.select_candidate(0)
+            return True  # 阻止回车键传播
+        else:
+            # 让回车键正常传播
+            return False
+    
+    def _handle_backspace(self) -> bool:
+        """处理退格键。
+        
+        Returns:
+            True如果应该阻止按键传播
+        """
+        # 修改输入后之前的AI请求已经过期，立即取消
+        self.ai_engine.abort_current()
+        # 如果在AI模式下，退出AI模式
+        mode = self._mode
+        if mode == Mode.AI:
+            self.exit_ai_mode()
+            return True  # 阻止退格键传播
+        elif mode == Mode.PINYIN:
+            self.pinyin_buffer = self.pinyin_buffer[:-1]
+            self.update_candidates()
+            if not self.pinyin_buffer:
+                self.deactivate()
+            return True  # 阻止退格键传播
+        else:
+            # 让退格键正常传播
+            return False
+    
+    def _handle_esc(self) -> bool:
+        """处理ESC键（取消输入）。
+        
+        Returns:
+            True如果应该阻止按键传播
+        """
+        # 如果在AI模式下，退出AI模式
+        mode = self._mode
+        if mode == Mode.AI:
+            self.exit_ai_mode()
+            return True  # 阻止ESC键传播
+        elif mode == Mode.PINYIN:
+            self.deactivate()
+            return True  # 阻止ESC键传播
+        else:
             return False
     
     def update_candidates(self):
-        """更新候选词列表。"""
-        if not self.pinyin_buffer:
-            self.candidates = []
-            self.full_candidates = []
+        """更新候选词列表。
+        
+        需要重新计算候选词时经过防抖，快速连续输入只计算最后一次；
+        清空缓冲区或退格回到已计算过的前缀时立即更新。
+        """
+        buffer = self.pinyin_buffer
+        timer = self._update_timer
+        if not buffer:
+            timer.stop()
+            self.candidates = ()
+            self.set_full_candidates([])
+            self._candidate_path = []
             self.current_page = 0
             self.candidate_window.hide()
             return
         
-        # 获取候选词
-        self.full_candidates = self.pinyin_engine.get_candidates(self.pinyin_buffer)
+        # 沿着输入路径记录每个前缀的结果，退格回到之前的前缀时不必重新计算
+        path = self._candidate_path
+        startswith = buffer.startswith
+        while path and not startswith(path[-1][0]):
+            path.pop()
+        if path and path[-1][0] == buffer:
+            timer.stop()
+            self._show_candidates(path[-1][1])
+            return
+        
+        timer.start()
+    
+    def flush_pending_update(self):
+        """立即完成等待中的候选词更新。"""
+        if self._update_timer.isActive():
+            self._update_timer.stop()
+            self._do_update_candidates()
+    
+    def _do_update_candidates(self):
+        """计算当前拼音缓冲区的候选词并显示。"""
+        buffer = self.pinyin_buffer
+        if not buffer:
+            return
+        candidates = tuple(self.pinyin_engine.get_candidates(buffer))
+        self._candidate_path.append((buffer, candidates))
+        self._show_candidates(candidates)
+    
+    def _show_candidates(self, candidates: Sequence[str]):
+        """显示新的候选词列表，从第一页开始。
+        
+        Args:
+            candidates: 完整候选词列表
+        """
+        self.set_full_candidates(candidates)
         self.current_page = 0
         self.show_current_page_candidates()
+    
+    def set_full_candidates(self, candidates: Sequence[str]):
+        """设置完整候选词列表，并预先按页切分。
+        
+        候选词保存为不可变的元组，各页是元组的切片，翻页时直接取用，不再复制。
+        
+        Args:
+            candidates: 完整候选词列表
+        """
+        candidates = tuple(candidates)
+        self.full_candidates = candidates
+        size = self.page_size
+        self._pages = [candidates[i:i + size] for i in range(0, len(candidates), size)]
+        self._total_pages = len(self._pages)
         
     def show_current_page_candidates(self):
         """显示当前页的候选词。"""
+        window = self.candidate_window
         if not self.full_candidates:
-            self.candidates = []
-            self.candidate_window.hide()
+            self.candidates = ()
+            window.hide()
             return
         
-        start_index = self.current_page * self.page_size
-        end_index = min(start_index + self.page_size, len(self.full_candidates))
-        self.candidates = self.full_candidates[start_index:end_index]
-        
-        total_pages = (len(self.full_candidates) + self.page_size - 1) // self.page_size
+        page = self.current_page
+        total_pages = self._total_pages
+        candidates = self._pages[page] if page < total_pages else ()
+        self.candidates = candidates
         
-        if self.candidates:
+        if candidates:
             # 显示候选词窗口
-            self.candidate_window.update_candidates(
-                self.candidates,
-                current_page=self.current_page,
+            window.update_candidates(
+                candidates,
+                current_page=page,
                 total_pages=total_pages
             )
             self.move_candidate_window()
         else:
             # 如果当前页没有候选词（可能发生在最后一页之后），尝试回到上一页
-            if self.current_page > 0:
-                self.current_page -= 1
+            if page > 0:
+                self.current_page = page - 1
                 self.show_current_page_candidates()
             else:
-                self.candidate_window.hide()
+                window.hide()
     
     def select_candidate(self, index: int):
         """选择候选词。
@@ -482,54 +616,38 @@ class InputManager(QObject):
         Args:
             index: 候选词索引
         """
-        if self.is_ai_mode:
+        if self._mode == Mode.AI:
             # AI模式下选择AI补全结果
             if 0 <= index < len(self.ai_completions):
                 selected_completion = self.ai_completions[index]
-                print(f"选择AI补全结果 {index}: '{selected_completion}'")
-                
-                # 清除拼音缓冲区中的字符
-                self.clear_pinyin_buffer()
+                log.debug("选择AI补全结果 %d: '%s'", index, selected_completion)
                 
-                # 使用延迟确保清除操作完成
-                QTimer.singleShot(50, lambda: self.input_text_delayed(selected_completion))
+                # 删除已输入的拼音字符并输入补全结果
+                self.input_text(selected_completion, erase_count=len(self.pinyin_buffer))
                 
                 # 记录最近输入的内容
-                self.last_input_text = selected_completion
-                self.last_input_pinyin = ""
+                self._history.append(("", selected_completion))
                 
                 # 退出AI模式并重置状态
                 self.exit_ai_mode()  # 确保这里正确退出AI模式
-                print(f"成功选择AI补全结果: '{selected_completion}'")
+                log.debug("成功选择AI补全结果: '%s'", selected_completion)
         else:
             # 普通模式下选择候选词
             if 0 <= index < len(self.candidates):
                 absolute_index = self.current_page * self.page_size + index
                 selected_word = self.full_candidates[absolute_index]
-                print(f"Selecting candidate {index} (absolute {absolute_index}): '{selected_word}'")
+                log.debug("Selecting candidate %d (absolute %d): '%s'", index, absolute_index, selected_word)
                 
-                # 清除拼音缓冲区中的字符
-                self.clear_pinyin_buffer()
-                
-                # 使用延迟确保清除操作完成
-                QTimer.singleShot(50, lambda: self.input_text_delayed(selected_word))
+                # 删除已输入的拼音字符并输入候选词
+                self.input_text(selected_word, erase_count=len(self.pinyin_buffer))
                 
                 # 记录最近输入的内容
-                self.last_input_text = selected_word
-                self.last_input_pinyin = self.pinyin_buffer
+                self._history.append((self.pinyin_buffer, selected_word))
                 
                 # 清空状态
                 self.reset_state()  # 确保这里正确重置状态
-                print(f"Successfully selected candidate: '{selected_word}'")
+                log.debug("Successfully selected candidate: '%s'", selected_word)
 
-    def input_text_delayed(self, text: str):
-        """延迟输入文本。
-        
-        Args:
-            text: 要输入的文本
-        """
-        self.input_text(text)
-    
     def on_candidate_selected(self, index: int):
         """处理候选词窗口的选择事件。
         
@@ -538,96 +656,78 @@ class InputManager(QObject):
         """
         self.select_candidate(index)
     
-    def input_text(self, text: str):
+    def input_text(self, text: str, erase_count: int = 0):
         """输入文本到当前应用程序。
         
         Args:
             text: 要输入的文本
+            erase_count: 输入前先删除的字符数（已输入的拼音）
         """
         try:
-            print(f"Inputting text: '{text}'")
-            
-            # 使用Windows剪贴板方式输入（更可靠）
-            if hasattr(ctypes.windll, 'user32'):
-                self.input_text_via_clipboard(text)
-            else:
-                # 备用方法：直接使用pyautogui
-                pyautogui.typewrite(text, interval=0.01)
-            
-            print(f"Text input completed: '{text}'")
+            log.debug("Inputting text: '%s'", text)
+            self._input_text_impl(text, erase_count)
+            log.debug("Text input completed: '%s'", text)
         except Exception as e:
-            print(f"Error inputting text: {e}")
+            log.error("Error inputting text: %s", e)
             # 备用方法
             try:
-                pyautogui.typewrite(text, interval=0.01)
+                _get_pyautogui().typewrite(text, interval=0.01)
             except Exception as e2:
-                print(f"Backup input method also failed: {e2}")
+                log.error("Backup input method also failed: %s", e2)
+    
+    def _select_input_text_impl(self):
+        """选择文本输入方式。
+        
+        Returns:
+            Windows上通过SendInput直接输入Unicode字符，否则直接使用pyautogui
+        """
+        try:
+            ctypes.windll.user32
+            return self.input_text_via_sendinput
+        except AttributeError:
+            return self.input_text_via_pyautogui
     
-    def input_text_via_clipboard(self, text: str):
-        """通过剪贴板输入文本。
+    def input_text_via_pyautogui(self, text: str, erase_count: int = 0):
+        """通过pyautogui逐字输入文本。
         
         Args:
             text: 要输入的文本
+            erase_count: 输入前先删除的字符数
         """
-        try:
-            import win32clipboard
-            import win32con
-            
-            # 保存当前剪贴板内容
-            win32clipboard.OpenClipboard()
-            try:
-                original_data = win32clipboard.GetClipboardData(win32con.CF_UNICODETEXT)
-            except:
-                original_data = ""
-            win32clipboard.CloseClipboard()
-            
-            # 设置新的剪贴板内容
-            win32clipboard.OpenClipboard()
-            win32clipboard.EmptyClipboard()
-            win32clipboard.SetClipboardText(text)
-            win32clipboard.CloseClipboard()
-            
-            # 发送Ctrl+V粘贴
-            pyautogui.hotkey('ctrl', 'v')
-            
-            # 延迟后恢复原剪贴板内容
-            QTimer.singleShot(100, lambda: self.restore_clipboard(original_data))
-            
-        except ImportError:
-            # 如果没有win32clipboard，使用备用方法
-            pyautogui.typewrite(text, interval=0.01)
-        except Exception as e:
-            print(f"Clipboard input failed: {e}")
-            pyautogui.typewrite(text, interval=0.01)
+        self.erase_chars(erase_count)
+        _get_pyautogui().typewrite(text, interval=0.01)
     
-    def restore_clipboard(self, original_data: str):
-        """恢复剪贴板内容。
+    def input_text_via_sendinput(self, text: str, erase_count: int = 0):
+        """通过SendInput直接输入Unicode文本。
+        
+        不经过剪贴板，也就不需要保存和恢复用户的剪贴板内容。
         
         Args:
-            original_data: 原始剪贴板内容
+            text: 要输入的文本
+            erase_count: 输入前先删除的字符数
         """
-        try:
-            import win32clipboard
-            win32clipboard.OpenClipboard()
-            win32clipboard.EmptyClipboard()
-            if original_data:
-                win32clipboard.SetClipboardText(original_data)
-            win32clipboard.CloseClipboard()
-        except:
-            pass
-    
-    def clear_pinyin_buffer(self):
-        """清除拼音缓冲区对应的字符。"""
-        if self.pinyin_buffer:
-            print(f"Clearing pinyin buffer: '{self.pinyin_buffer}' ({len(self.pinyin_buffer)} chars)")
-            # 发送退格键清除已输入的拼音
-            for _ in range(len(self.pinyin_buffer)):
-                pyautogui.press('backspace')
-            print("Pinyin buffer cleared")
+        # 退格和文本放在同一次SendInput中，系统按顺序处理，不需要额外等待
+        if not win_input.send_text(text, erase_count):
+            log.warning("SendInput failed, falling back to pyautogui")
+            self.input_text_via_pyautogui(text, erase_count)
+    
+    def erase_chars(self, count: int):
+        """发送退格键删除已输入的字符。
+        
+        Args:
+            count: 要删除的字符数
+        """
+        if count:
+            log.debug("Erasing %d chars", count)
+            # 优先一次SendInput批量发送，不支持时逐个发送
+            if not win_input.send_backspaces(count):
+                _get_pyautogui().press('backspace', presses=count, interval=0.01)
     
     def exit_ai_mode(self):
         """退出AI模式，恢复普通候选词显示。"""
-        self.is_ai_mode = False
+        # 显示的可能是流式生成中的部分结果，停止生成，避免结果再次弹出
+        self.ai_engine.abort_current()
+        self._mode = Mode.PINYIN if self.pinyin_buffer else Mode.IDLE
         self.ai_completions = []
         # 重新显示普通候选词
         self.show_current_page_candidates()
@@ -635,15 +735,17 @@ class InputManager(QObject):
     
     def reset_state(self):
         """重置输入状态。"""
+        self._update_timer.stop()
+        self._cursor_pos = None
         self.pinyin_buffer = ""
-        self.candidates = []
-        self.full_candidates = []
+        self.candidates = ()
+        self.set_full_candidates([])
+        self._candidate_path = []
         self.current_page = 0
-        self.is_active = False
-        self.is_ai_mode = False
+        self._mode = Mode.IDLE
         self.ai_completions = []
         self.candidate_window.hide()
-        # 注意：不清除last_input_text和last_input_pinyin，以便双击Tab时使用
+        # 注意：不清除最近输入记录，以便双击Tab时使用
     
     def deactivate(self):
         """取消激活输入法。"""
@@ -656,7 +758,7 @@ class InputManager(QObject):
             # 将候选词窗口显示在鼠标指针的左下方5px处
             self.candidate_window.move_window(x - 5, y + 5)
         except Exception as e:
-            print(f"Error moving candidate window: {e}")
+            log.warning("Error moving candidate window: %s", e)
             # 使用默认位置
             screen = QApplication.primaryScreen().geometry()
             self.candidate_window.move_window(screen.width() // 2, screen.height() // 2)
@@ -667,18 +769,24 @@ class InputManager(QObject):
         Returns:
             光标位置的(x, y)坐标
         """
+        now = time.monotonic()
+        if self._cursor_pos is not None and now - self._cursor_pos_time < self.cursor_refresh_interval:
+            return self._cursor_pos
+        
         try:
             # 尝试使用Windows API获取光标位置
-            class POINT(ctypes.Structure):
-                _fields_ = [("x", ctypes.c_long), ("y", ctypes.c_long)]
-            
-            point = POINT()
-            ctypes.windll.user32.GetCursorPos(ctypes.byref(point))
-            return point.x, point.y
+            if _GetCursorPos is None:
+                raise OSError("GetCursorPos is not available")
+            _GetCursorPos(ctypes.byref(_cursor_point))
+            pos = (_cursor_point.x, _cursor_point.y)
         except Exception:
             # 如果失败，使用屏幕中心
             screen = QApplication.primaryScreen().geometry()
-            return screen.width() // 2, screen.height() // 2
+            pos = (screen.width() // 2, screen.height() // 2)
+        
+        self._cursor_pos = pos
+        self._cursor_pos_time = now
+        return pos
     
     def clean_text_for_ai(self, text: str) -> str:
         """清理发送给AI的文本，移除可能导致问题的特殊字符。
@@ -690,9 +798,27 @@ class InputManager(QObject):
             str: 清理后的文本
         """
         # 移除特殊字符，只保留字母、数字和常见标点符号
-        cleaned_text = re.sub(r'[^\w\s.,!?]', '', text)
+        if text.isascii():
+            cleaned_text = text.translate(_ASCII_STRIP_TABLE)
+        else:
+            cleaned_text = _CLEAN_RE.sub('', text)
         return cleaned_text.strip()
 
+
+# 功能键到处理方法的分发表
+_KEY_DISPATCH = {
+    keyboard.Key.left: InputManager._handle_left,
+    keyboard.Key.right: InputManager._handle_right,
+    keyboard.Key.up: InputManager._handle_up,
+    keyboard.Key.down: InputManager._handle_down,
+    keyboard.Key.tab: InputManager._handle_tab,
+    keyboard.Key.space: InputManager._handle_space,
+    keyboard.Key.enter: InputManager._handle_enter,
+    keyboard.Key.backspace: InputManager._handle_backspace,
+    keyboard.Key.esc: InputManager._handle_esc,
+}
+
+
 if __name__ == '__main__':
     # 测试输入管理器
     from PyQt6.QtWidgets import QApplication
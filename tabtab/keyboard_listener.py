@@ -6,15 +6,25 @@
 """
 
 from pynput import keyboard
-from PyQt6.QtCore import QObject, pyqtSignal, QThread
-from typing import Callable, Optional
+from PyQt6.QtCore import QObject, pyqtSignal
+from typing import Optional, Tuple
+
+import win_input
+
+
+# 主键盘(0x30-0x39)和小键盘(0x60-0x69)数字键的虚拟键码到数字字符的映射，
+# 用于没有char属性的数字键（如部分系统上的小键盘）
+_VK_DIGIT_CHARS = {vk: str(vk - 0x30) for vk in range(0x30, 0x3A)}
+_VK_DIGIT_CHARS.update({vk: str(vk - 0x60) for vk in range(0x60, 0x6A)})
+_DIGIT_CHARS = frozenset('0123456789')
 
 
 class KeyboardListener(QObject):
-    """全局键盘监听器，在独立线程中监听键盘事件。
+    """全局键盘监听器，在pynput的监听线程中接收键盘事件。
     
-    为了避免pynput阻塞主GUI线程，该监听器在一个单独的QThread中运行。
-    它通过发出keyPressed信号，将键盘事件安全地传递给主线程进行处理。
+    pynput自己会创建监听线程，不需要再包一层QThread。回调在监听线程中
+    发出key_pressed信号，接收者使用队列连接，事件就会投递到接收者所在的
+    GUI线程处理，监听线程发出信号后立即返回。
     """
     
     # 信号：键盘按下事件
@@ -43,7 +53,9 @@ class KeyboardListener(QObject):
         try:
             self.listener = keyboard.Listener(
                 on_press=self.on_key_press,
-                on_release=self.on_key_release
+                on_release=self.on_key_release,
+                # 只在Windows上生效，其他平台忽略该参数
+                win32_event_filter=self._win32_event_filter
             )
             self.listener.start()
             self.is_listening = True
@@ -51,6 +63,23 @@ class KeyboardListener(QObject):
         except Exception as e:
             print(f"Failed to start keyboard listener: {e}")
     
+    @staticmethod
+    def _win32_event_filter(msg, data) -> bool:
+        """在低级键盘钩子中过滤事件，仅Windows上调用。
+        
+        本程序通过SendInput注入的按键（删除拼音的退格和输入的文本）
+        在转换为按键对象、发出信号之前就被丢弃，不会再回到输入法的按键处理中；
+        事件本身仍然正常传递给目标程序。
+        
+        Args:
+            msg: 窗口消息
+            data: KBDLLHOOKSTRUCT结构体
+            
+        Returns:
+            返回False时pynput不再处理该事件
+        """
+        return data.dwExtraInfo != win_input.INPUT_EXTRA_INFO
+    
     def stop_listening(self):
         """停止键盘监听。"""
         if self.listener and self.is_listening:
@@ -99,44 +128,6 @@ class KeyboardListener(QObject):
             print(f"Error in key release handler: {e}")
 
 
-class KeyboardListenerThread(QThread):
-    """键盘监听器线程，管理KeyboardListener的生命周期。"""
-    
-    # 信号
-    key_pressed = pyqtSignal(object)
-    key_released = pyqtSignal(object)
-    
-    def __init__(self, parent=None):
-        """初始化监听器线程。"""
-        super().__init__(parent)
-        self.listener = KeyboardListener()
-        
-        # 连接信号
-        self.listener.key_pressed.connect(self.key_pressed.emit)
-        self.listener.key_released.connect(self.key_released.emit)
-        
-        # 将监听器移动到当前线程
-        self.listener.moveToThread(self)
-    def run(self):
-        """线程运行方法。"""
-        self.listener.start_listening()
-        self.exec()  # 启动事件循环
-    
-    def stop_listening(self):
-        """停止监听并退出线程。"""
-        self.listener.stop_listening()
-        self.quit()
-        self.wait()
-    
-    def set_key_handler(self, handler: Callable):
-        """设置按键处理函数。
-        
-        Args:
-            handler: 按键处理函数，返回True表示阻止按键，False表示允许传播
-        """
-        self.listener.set_key_handler(handler)
-
-
 def is_printable_char(key) -> bool:
     """判断按键是否为可打印字符。
     
@@ -152,68 +143,24 @@ def is_printable_char(key) -> bool:
         return False
 
 
-def is_alpha_char(key) -> bool:
-    """判断按键是否为字母字符。
+def classify_key(key) -> Tuple[str, bool, bool]:
+    """一次取得按键的字符，并判断是否为数字键和字母键。
     
-    Args:
-        key: 按键对象
-        
-    Returns:
-        如果是字母字符则返回True
-    """
-    try:
-        return hasattr(key, 'char') and key.char and key.char.isalpha()
-    except:
-        return False
-
-
-def is_digit_char(key) -> bool:
-    """判断按键是否为数字字符。
+    按键事件处理时只需要调用一次，后续判断都复用返回的结果。
     
     Args:
         key: 按键对象
         
     Returns:
-        如果是数字字符则返回True
+        (按键对应的字符, 是否为数字字符, 是否为字母字符)，
+        无法获取字符时字符为空字符串
     """
-    try:
-        # 处理 pynput.keyboard.KeyCode
-        if hasattr(key, 'char') and key.char and key.char.isdigit():
-            return True
-        # 处理 pynput.keyboard.Key (例如 numpad 数字)
-        if hasattr(key, 'name') and key.name and key.name.startswith('num_'):
-            return key.name.split('_')[1].isdigit()
-        # 兼容 vk
-        if hasattr(key, 'vk') and 48 <= key.vk <= 57: # 主键盘数字 0-9
-            return True
-        if hasattr(key, 'vk') and 96 <= key.vk <= 105: # 小键盘数字 0-9
-            return True
-        return False
-    except:
-        return False
-
-
-def get_key_char(key) -> str:
-    """获取按键对应的字符。
-    
-    Args:
-        key: 按键对象
-        
-    Returns:
-        按键对应的字符，如果无法获取则返回空字符串
-    """
-    try:
-        if hasattr(key, 'char') and key.char:
-            return key.char
-        # 兼容 vk for numpad
-        if hasattr(key, 'vk') and 96 <= key.vk <= 105:
-            return str(key.vk - 96)
-        # 兼容 vk for main keyboard
-        if hasattr(key, 'vk') and 48 <= key.vk <= 57:
-            return str(key.vk - 48)
-    except:
-        pass
-    return ""
+    char = getattr(key, 'char', None)
+    if not char:
+        # 没有字符的数字键按虚拟键码查表
+        char = _VK_DIGIT_CHARS.get(getattr(key, 'vk', None), "")
+        return char, bool(char), False
+    return char, char in _DIGIT_CHARS, char.isalpha()
 
 
 if __name__ == '__main__':
@@ -231,15 +178,16 @@ if __name__ == '__main__':
     def on_key_release(key):
         print(f"Key released: {key}")
     
-    # 创建监听器线程
-    listener_thread = KeyboardListenerThread()
-    listener_thread.key_pressed.connect(on_key_press)
-    listener_thread.key_released.connect(on_key_release)
+    # 创建监听器，信号在pynput的监听线程中发出，使用队列连接转到主线程处理
+    from PyQt6.QtCore import Qt
+    listener = KeyboardListener()
+    listener.key_pressed.connect(on_key_press, Qt.ConnectionType.QueuedConnection)
+    listener.key_released.connect(on_key_release, Qt.ConnectionType.QueuedConnection)
     
     # 启动监听
-    listener_thread.start()
+    listener.start_listening()
     
     try:
         app.exec()
     finally:
-        listener_thread.stop_listening()
+        listener.stop_listening()
@@ -8,8 +8,10 @@
 import sys
 import os
 import signal
+import socket
+import logging
 from PyQt6.QtWidgets import QApplication, QSystemTrayIcon, QMenu
-from PyQt6.QtCore import QTimer
+from PyQt6.QtCore import QTimer, QSocketNotifier
 from PyQt6.QtGui import QIcon, QAction
 
 from input_manager import InputManager
@@ -27,8 +29,9 @@ class TabTabApplication:
         self.app.setApplicationName("TabTab输入法")
         self.app.setApplicationVersion("1.0.0")
         
-        # 输入管理器
-        self.input_manager = InputManager()
+        # 输入管理器，构造时要加载词库，推迟到第一次启动输入法时再创建，
+        # 让托盘图标先显示出来
+        self.input_manager = None
         
         # 系统托盘
         self.setup_system_tray()
@@ -46,9 +49,8 @@ class TabTabApplication:
         self.tray_icon = QSystemTrayIcon(self.app)
         
         # 设置托盘图标（使用默认图标）
-        self.tray_icon.setIcon(self.app.style().standardIcon(
-            self.app.style().StandardPixmap.SP_ComputerIcon
-        ))
+        style = self.app.style()
+        self.tray_icon.setIcon(style.standardIcon(style.StandardPixmap.SP_ComputerIcon))
         
         # 创建托盘菜单
         tray_menu = QMenu()
@@ -87,10 +89,35 @@ class TabTabApplication:
         # 处理Ctrl+C信号
         signal.signal(signal.SIGINT, self.signal_handler)
         
-        # 定期检查信号的定时器
-        self.signal_timer = QTimer()
-        self.signal_timer.timeout.connect(lambda: None)  # 允许处理信号
-        self.signal_timer.start(100)  # 每100ms检查一次
+        # Qt事件循环阻塞时Python的信号处理函数没有机会执行。收到信号时
+        # 解释器会向wakeup fd写入一个字节，由QSocketNotifier唤醒事件循环，
+        # 不需要定时轮询。Windows上set_wakeup_fd只接受套接字，因此使用socketpair
+        self._signal_sock_r, self._signal_sock_w = socket.socketpair()
+        self._signal_sock_r.setblocking(False)
+        self._signal_sock_w.setblocking(False)
+        try:
+            signal.set_wakeup_fd(self._signal_sock_w.fileno())
+        except ValueError as e:
+            # 无法设置wakeup fd时退回到定期唤醒事件循环，保证Ctrl+C仍然有效
+            print(f"Failed to set signal wakeup fd, falling back to polling: {e}")
+            self._signal_sock_r.close()
+            self._signal_sock_w.close()
+            self.signal_timer = QTimer()
+            self.signal_timer.timeout.connect(lambda: None)  # 允许处理信号
+            self.signal_timer.start(100)  # 每100ms检查一次
+            return
+        
+        self.signal_notifier = QSocketNotifier(
+            self._signal_sock_r.fileno(), QSocketNotifier.Type.Read
+        )
+        self.signal_notifier.activated.connect(self._drain_signal_socket)
+    
+    def _drain_signal_socket(self):
+        """读出wakeup fd中的数据，回到Python后信号处理函数随即执行。"""
+        try:
+            self._signal_sock_r.recv(4096)
+        except OSError:
+            pass
     
     def signal_handler(self, signum, frame):
         """处理系统信号。"""
@@ -100,6 +127,8 @@ class TabTabApplication:
     def start_input_method(self):
         """启动输入法。"""
         try:
+            if self.input_manager is None:
+                self.input_manager = InputManager()
             self.input_manager.start()
             self.start_action.setEnabled(False)
             self.stop_action.setEnabled(True)
@@ -121,6 +150,8 @@ class TabTabApplication:
     
     def stop_input_method(self):
         """停止输入法。"""
+        if self.input_manager is None:
+            return
         try:
             self.input_manager.stop()
             self.start_action.setEnabled(True)
@@ -168,6 +199,11 @@ class TabTabApplication:
 
 def main():
     """主函数。"""
+    # 默认只输出INFO及以上的日志，设置环境变量TABTAB_DEBUG=1时输出按键处理等调试日志
+    debug = os.environ.get("TABTAB_DEBUG") == "1"
+    logging.basicConfig(level=logging.DEBUG if debug else logging.INFO,
+                        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    
     # 设置Windows DPI感知（如果是Windows系统）
     if sys.platform == "win32":
         try:
@@ -5,12 +5,14 @@
 """
 
 import sys
-from PyQt6.QtWidgets import QApplication
-from input_manager import InputManager
 
 
 def main():
     """主函数。"""
+    # PyQt6和输入管理器（连同词库）在真正启动时才导入，只导入本模块时不加载
+    from PyQt6.QtWidgets import QApplication
+    from input_manager import InputManager
+    
     print("=== TabTab输入法 ===")
     print("启动中...")
     
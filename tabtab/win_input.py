@@ -0,0 +1,187 @@
+# tabtab/win_input.py
+"""基于Win32 SendInput的键盘输入模拟。
+
+pyautogui每次按键都会单独调用一次SendInput，并在按键之间插入PAUSE等待。
+该模块把一组按键事件放进同一个INPUT数组，通过一次SendInput调用提交，
+系统会按顺序处理这些事件；文本通过KEYEVENTF_UNICODE直接输入，
+不需要经过剪贴板。非Windows平台上所有发送函数都返回False，
+调用方可以回退到pyautogui。
+"""
+
+import ctypes
+import struct
+from ctypes import wintypes
+from typing import List, Sequence
+
+
+INPUT_KEYBOARD = 1
+KEYEVENTF_KEYUP = 0x0002
+KEYEVENTF_UNICODE = 0x0004
+
+VK_BACK = 0x08
+
+# ULONG_PTR在32位和64位系统上的长度不同
+ULONG_PTR = ctypes.c_size_t
+
+# 写入每个事件的dwExtraInfo，键盘钩子据此识别本程序自己注入的按键
+INPUT_EXTRA_INFO = 0x54414254
+
+
+class KEYBDINPUT(ctypes.Structure):
+    _fields_ = [
+        ("wVk", wintypes.WORD),
+        ("wScan", wintypes.WORD),
+        ("dwFlags", wintypes.DWORD),
+        ("time", wintypes.DWORD),
+        ("dwExtraInfo", ULONG_PTR),
+    ]
+
+
+class MOUSEINPUT(ctypes.Structure):
+    _fields_ = [
+        ("dx", wintypes.LONG),
+        ("dy", wintypes.LONG),
+        ("mouseData", wintypes.DWORD),
+        ("dwFlags", wintypes.DWORD),
+        ("time", wintypes.DWORD),
+        ("dwExtraInfo", ULONG_PTR),
+    ]
+
+
+class HARDWAREINPUT(ctypes.Structure):
+    _fields_ = [
+        ("uMsg", wintypes.DWORD),
+        ("wParamL", wintypes.WORD),
+        ("wParamH", wintypes.WORD),
+    ]
+
+
+class _INPUTUNION(ctypes.Union):
+    # 联合体必须包含MOUSEINPUT，INPUT结构体的大小才与系统定义一致
+    _fields_ = [
+        ("mi", MOUSEINPUT),
+        ("ki", KEYBDINPUT),
+        ("hi", HARDWAREINPUT),
+    ]
+
+
+class INPUT(ctypes.Structure):
+    _anonymous_ = ("u",)
+    _fields_ = [
+        ("type", wintypes.DWORD),
+        ("u", _INPUTUNION),
+    ]
+
+
+def _load_send_input():
+    """获取user32.SendInput函数，非Windows平台返回None。"""
+    try:
+        send_input = ctypes.windll.user32.SendInput
+    except AttributeError:
+        return None
+    send_input.argtypes = (wintypes.UINT, ctypes.POINTER(INPUT), ctypes.c_int)
+    send_input.restype = wintypes.UINT
+    return send_input
+
+
+_SendInput = _load_send_input()
+
+
+def key_event(vk: int, key_up: bool = False) -> INPUT:
+    """构造一个虚拟键按下或释放事件。
+
+    Args:
+        vk: 虚拟键码
+        key_up: 是否为释放事件
+
+    Returns:
+        INPUT结构体
+    """
+    event = INPUT(type=INPUT_KEYBOARD)
+    event.ki.wVk = vk
+    event.ki.dwFlags = KEYEVENTF_KEYUP if key_up else 0
+    event.ki.dwExtraInfo = INPUT_EXTRA_INFO
+    return event
+
+
+def unicode_events(text: str) -> List[INPUT]:
+    """构造直接输入文本的事件序列。
+
+    每个UTF-16编码单元对应一对KEYEVENTF_UNICODE按下和释放事件，
+    代理对会按两个编码单元依次发送，由系统组合成一个字符。
+
+    Args:
+        text: 要输入的文本
+
+    Returns:
+        INPUT结构体列表
+    """
+    data = text.encode('utf-16-le')
+    events = []
+    for unit in struct.unpack(f'<{len(data) // 2}H', data):
+        for flags in (KEYEVENTF_UNICODE, KEYEVENTF_UNICODE | KEYEVENTF_KEYUP):
+            event = INPUT(type=INPUT_KEYBOARD)
+            event.ki.wScan = unit
+            event.ki.dwFlags = flags
+            event.ki.dwExtraInfo = INPUT_EXTRA_INFO
+            events.append(event)
+    return events
+
+
+def key_taps(vk: int, count: int) -> List[INPUT]:
+    """构造连续按下并释放同一个键count次的事件序列。
+
+    Args:
+        vk: 虚拟键码
+        count: 按键次数
+
+    Returns:
+        INPUT结构体列表
+    """
+    return [key_event(vk, key_up) for _ in range(count) for key_up in (False, True)]
+
+
+def send_inputs(events: Sequence[INPUT]) -> bool:
+    """通过一次SendInput调用提交所有事件。
+
+    Args:
+        events: INPUT结构体序列
+
+    Returns:
+        所有事件都被系统接收时返回True，不支持或被拦截时返回False
+    """
+    if not events:
+        return True
+    if _SendInput is None:
+        return False
+    array = (INPUT * len(events))(*events)
+    sent = _SendInput(len(events), array, ctypes.sizeof(INPUT))
+    return sent == len(events)
+
+
+def send_backspaces(count: int) -> bool:
+    """一次性发送count个退格键。
+
+    Args:
+        count: 退格次数
+
+    Returns:
+        发送成功返回True
+    """
+    return send_inputs(key_taps(VK_BACK, count))
+
+
+def send_text(text: str, erase_count: int = 0) -> bool:
+    """在同一次SendInput中发送erase_count个退格键和要输入的文本。
+
+    系统按数组顺序处理事件，文本一定在退格之后输入，
+    不需要在两者之间等待。
+
+    Args:
+        text: 要输入的文本
+        erase_count: 输入前先删除的字符数
+
+    Returns:
+        发送成功返回True
+    """
+    return send_inputs(key_taps(VK_BACK, erase_count) + unicode_events(text))
@@ -7,11 +7,12 @@ import os
 # 添加tabtab模块到路径
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'tabtab'))
 
-from PyQt6.QtWidgets import QApplication
-from tabtab.input_manager import InputManager
-
 def main():
     """主函数"""
+    # PyQt6和输入管理器在真正启动时才导入，只导入本模块时不加载
+    from PyQt6.QtWidgets import QApplication
+    from tabtab.input_manager import InputManager
+    
     print("=" * 50)
     print("TabTab 输入法测试")
     print("=" * 50)